@@ -0,0 +1,213 @@
+"""
+Time the hot paths of the SQLite data layer against synthetic numbers tables and emit
+the timings as JSON, so a regression in the database code shows up as a number that
+moved between two runs rather than as a slow production night.
+
+    python run_bench.py --sizes 10k,1m,10m --output results.json
+"""
+import contextlib
+import json
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database_manager import DatabaseManager
+from export_results import export_results
+from import_numbers import import_numbers
+import progress_server
+from synthetic_numbers import create_numbers_db, parse_size, write_numbers_csv
+
+DEFAULT_SIZES = '10k,1m,10m'
+
+def summarize(operation: str, size: int, durations: List[float], rows: Optional[int] = None) -> Dict:
+    """One JSON result: per-call latency figures, plus throughput when rows were processed"""
+    ordered = sorted(durations)
+    total = sum(durations)
+    result = {
+        'operation': operation,
+        'rows_in_table': size,
+        'iterations': len(durations),
+        'total_s': round(total, 6),
+        'mean_ms': round(statistics.mean(durations) * 1000, 4),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 4),
+        'p95_ms': round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+    }
+    if rows is not None:
+        result['rows'] = rows
+        result['rows_per_s'] = round(rows / total, 1) if total > 0 else None
+    return result
+
+def time_calls(fn: Callable, iterations: int) -> List[float]:
+    """Wall time of each of iterations calls to fn"""
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+def time_once(fn: Callable):
+    """(duration, return value) of a single call"""
+    start = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - start, value
+
+def fake_result(i: int) -> Dict:
+    """An API-shaped answer, alternating registered and not registered"""
+    if i % 3 == 0:
+        return {'Active': True, 'AddedAt': '2015-06-01T00:00:00'}
+    return {'Active': False, 'AddedAt': None}
+
+def bench_size(size: int, data_dir: Path, iterations: int, skip: List[str]) -> List[Dict]:
+    """Every benchmark against one table size; the cached base table is copied, never modified"""
+    results = []
+    base_db = data_dir / f"numbers-{size}.db"
+    if not base_db.exists():
+        log(f"Generating {size} rows into {base_db}")
+        duration, _ = time_once(lambda: create_numbers_db(base_db, size))
+        results.append(summarize('generate_synthetic_table', size, [duration], size))
+
+    work_dir = Path(tempfile.mkdtemp(prefix='dncl-bench-'))
+    try:
+        db_path = work_dir / 'numbers.db'
+        shutil.copyfile(base_db, db_path)
+
+        # First open: columns, indexes, ANALYZE, progress counters, change tracking
+        duration, db = time_once(lambda: DatabaseManager(str(db_path)))
+        results.append(summarize('setup_database', size, [duration], size))
+
+        duration, (normalized, _) = time_once(db.normalize_numbers)
+        results.append(summarize('normalize_numbers', size, [duration], normalized))
+        duration, parked = time_once(db.plan_duplicates)
+        results.append(summarize('plan_duplicates', size, [duration], parked))
+
+        results.append(summarize('get_unprocessed_count', size, time_calls(db.get_unprocessed_count, iterations)))
+
+        claimed = []
+        results.append(summarize('get_next_engineer', size,
+                                 time_calls(lambda: claimed.append(db.get_next_engineer()), iterations)))
+        pending = iter(engineer for engineer in claimed if engineer)
+        results.append(summarize('update_engineer_dncl_status', size, time_calls(
+            lambda: db.update_engineer_dncl_status(next(pending)['id'], fake_result(1)), len(claimed))))
+
+        batch_size = 1000
+        batches = []
+        results.append(summarize('claim_batch_1000', size,
+                                 time_calls(lambda: batches.append(db.claim_batch(batch_size)), 10),
+                                 sum(len(batch) for batch in batches)))
+        remaining = iter(batches)
+        results.append(summarize('bulk_update_dncl_status_1000', size, time_calls(
+            lambda: db.bulk_update_dncl_status(
+                [(engineer['id'], fake_result(i)) for i, engineer in enumerate(next(remaining))]
+            ), len(batches)), sum(len(batch) for batch in batches)))
+
+        results.extend(bench_dashboard(db, db_path, size, iterations))
+
+        if 'export' not in skip:
+            for name, suffix in (('export_csv', '.csv'), ('export_csv_gz', '.csv.gz'), ('export_parquet', '.parquet')):
+                output = work_dir / f"export{suffix}"
+                try:
+                    duration, written = time_once(lambda: export_results(output, db_path=str(db_path)))
+                except RuntimeError as e:  # pyarrow not installed
+                    log(f"Skipping {name}: {e}")
+                    continue
+                results.append(summarize(name, size, [duration], written))
+                output.unlink()
+            duration, written = time_once(lambda: export_results(
+                work_dir / 'full.csv', db_path=str(db_path), incremental='bench'))
+            results.append(summarize('export_incremental_first', size, [duration], written))
+            # Flip the answers of one claimed batch, so the delta has a known size at every table size
+            db.bulk_update_dncl_status([(engineer['id'], fake_result(i + 1)) for i, engineer in enumerate(batches[0])])
+            duration, written = time_once(lambda: export_results(
+                work_dir / 'delta.csv', db_path=str(db_path), incremental='bench'))
+            results.append(summarize('export_incremental_delta', size, [duration], written))
+        db.close()
+
+        if 'import' not in skip:
+            csv_path = work_dir / 'leads.csv'
+            write_numbers_csv(csv_path, size)
+            duration, (inserted, _) = time_once(lambda: import_numbers(csv_path, str(work_dir / 'imported.db')))
+            results.append(summarize('import_csv', size, [duration], inserted))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def bench_dashboard(db: DatabaseManager, db_path: Path, size: int, iterations: int) -> List[Dict]:
+    """Render the first results page and a page deep into the results through the Flask app"""
+    progress_server.DB_PATH = str(db_path)
+    progress_server._db = db
+    client = progress_server.app.test_client()
+
+    with db.connection() as conn:
+        middle = conn.execute("""
+            SELECT dncl_checked_at, id FROM numbers
+            WHERE dncl_checked_at IS NOT NULL
+            ORDER BY dncl_checked_at, id
+            LIMIT 1 OFFSET (SELECT checked_count / 2 FROM dncl_progress ORDER BY checked_count DESC LIMIT 1)
+        """).fetchone()
+
+    def render(url: str):
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+
+    results = [summarize('dashboard_first_page', size, time_calls(lambda: render('/'), iterations))]
+    if middle:
+        url = f"/?after={progress_server.encode_cursor(middle)}&page=2"
+        results.append(summarize('dashboard_deep_page', size, time_calls(lambda: render(url), iterations)))
+    progress_server._db = None
+    return results
+
+def log(message: str):
+    print(message, file=sys.stderr)
+
+def run(sizes: List[int], data_dir: Path, iterations: int, skip: List[str]) -> Dict:
+    results = []
+    for size in sizes:
+        log(f"Benchmarking {size} rows")
+        # The code under test prints progress; keep stdout for the JSON report
+        with contextlib.redirect_stdout(sys.stderr):
+            results.extend(bench_size(size, data_dir, iterations, skip))
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'iterations': iterations,
+        },
+        'results': results,
+    }
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the numbers-table data path on synthetic data")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"Comma-separated table sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument('--data-dir', default=str(Path(tempfile.gettempdir()) / 'dncl-bench'),
+                        help="Where generated tables are cached between runs")
+    parser.add_argument('--iterations', type=int, default=200, help="Calls per latency benchmark")
+    parser.add_argument('--skip', action='append', default=[], choices=['import', 'export'])
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    report = run([parse_size(size) for size in args.sizes.split(',')], data_dir, args.iterations, args.skip)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        log(f"Wrote {len(report['results'])} results to {args.output}")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
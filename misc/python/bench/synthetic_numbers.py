@@ -0,0 +1,132 @@
+"""
+Synthetic numbers tables shaped like the real lead files: mostly mobile numbers written
+the way the source data writes them, a few duplicates, extensions and foreign numbers,
+and part of the table already checked so the dashboard has results to page through.
+"""
+import csv
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Tuple, Union
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from phone_numbers import canadian_area_codes
+
+COLUMNS = ['id', 'nom', 'prenom', 'telephone', 'phone_type', 'ville',
+           'dncl_status', 'dncl_registration_date', 'dncl_checked_at']
+
+CITIES = ['Montreal', 'Quebec', 'Laval', 'Gatineau', 'Longueuil', 'Sherbrooke', 'Toronto', 'Ottawa']
+
+def parse_size(value: str) -> int:
+    """'10k', '1m', '10M' or a plain row count"""
+    value = value.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+def _telephone(rng: random.Random, area_codes: list) -> str:
+    """A number in one of the formats seen in the lead files"""
+    npa = rng.choice(area_codes)
+    nxx = rng.randint(200, 999)
+    line = rng.randint(0, 9999)
+    style = rng.random()
+    if style < 0.80:
+        return f"{npa}-{nxx}-{line:04d}"
+    if style < 0.90:
+        return f"({npa}) {nxx}-{line:04d}"
+    if style < 0.95:
+        return f"+1 {npa} {nxx} {line:04d}"
+    if style < 0.98:
+        return f"{npa}-{nxx}-{line:04d} x{rng.randint(1, 999)}"
+    return f"212-{nxx}-{line:04d}"  # Not a Canadian area code
+
+def iter_rows(n: int, checked_share: float = 0.4, duplicate_share: float = 0.05,
+              seed: int = 42) -> Iterator[Tuple]:
+    """n rows in COLUMNS order; the same seed always produces the same table"""
+    rng = random.Random(seed)
+    area_codes = sorted(canadian_area_codes())
+    recent = []
+    start = datetime(2026, 1, 1)
+    for row_id in range(1, n + 1):
+        if recent and rng.random() < duplicate_share:
+            telephone = rng.choice(recent)
+        else:
+            telephone = _telephone(rng, area_codes)
+            if len(recent) < 10000:
+                recent.append(telephone)
+            else:
+                recent[rng.randrange(10000)] = telephone
+
+        status = registration_date = checked_at = None
+        if rng.random() < checked_share:
+            status = 'ACTIVE' if rng.random() < 0.3 else 'INACTIVE'
+            if status == 'ACTIVE':
+                registration_date = f"{rng.randint(2009, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00"
+            checked_at = (start + timedelta(seconds=row_id)).isoformat()
+
+        yield (
+            row_id,
+            f"Nom{row_id}",
+            f"Prenom{row_id}",
+            telephone,
+            'MOBILE' if rng.random() < 0.8 else 'LANDLINE',
+            rng.choice(CITIES),
+            status,
+            registration_date,
+            checked_at
+        )
+
+def create_numbers_db(path: Union[str, Path], n: int, seed: int = 42, batch_size: int = 100000):
+    """Write a fresh synthetic numbers table to path (replacing any existing file)"""
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("""
+        CREATE TABLE numbers (
+            id INTEGER PRIMARY KEY,
+            nom TEXT,
+            prenom TEXT,
+            telephone TEXT,
+            phone_type TEXT,
+            ville TEXT,
+            dncl_status TEXT,
+            dncl_registration_date TEXT,
+            dncl_checked_at TEXT
+        )
+    """)
+    placeholders = ', '.join('?' for _ in COLUMNS)
+    rows = iter_rows(n, seed=seed)
+    while True:
+        batch = [row for _, row in zip(range(batch_size), rows)]
+        if not batch:
+            break
+        with conn:
+            conn.executemany(f"INSERT INTO numbers ({', '.join(COLUMNS)}) VALUES ({placeholders})", batch)
+    conn.close()
+
+def write_numbers_csv(path: Union[str, Path], n: int, seed: int = 42):
+    """The same synthetic rows as a lead CSV, for timing the importer"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(iter_rows(n, seed=seed))
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic numbers table")
+    parser.add_argument('size', help="Row count, e.g. 10k, 1m, 10m")
+    parser.add_argument('output', help="SQLite file to create (or .csv for a lead file)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.output.lower().endswith('.csv'):
+        write_numbers_csv(args.output, parse_size(args.size), args.seed)
+    else:
+        create_numbers_db(args.output, parse_size(args.size), args.seed)
+    print(f"Wrote {parse_size(args.size)} rows to {args.output}")
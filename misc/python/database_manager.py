@@ -0,0 +1,784 @@
+import os
+import queue
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from send_dncl_request import format_phone_number
+from phone_numbers import normalize_phone_column
+
+# Indexes backing the hot queries. The WHERE clauses must stay textually identical to the
+# filters in claim_batch and progress_server for SQLite to use them.
+NUMBERS_INDEXES = {
+    # Pending work: claim_batch
+    'idx_numbers_pending': """
+        ON numbers(id)
+        WHERE (dncl_status IS NULL OR dncl_status = '')
+        AND telephone IS NOT NULL
+        AND phone_type = 'MOBILE'
+    """,
+    # Per-status lookups over mobile rows, e.g. claimed rows whose lease may have expired
+    'idx_numbers_mobile_status': """
+        ON numbers(dncl_status)
+        WHERE telephone IS NOT NULL
+        AND phone_type = 'MOBILE'
+    """,
+    # Rows sharing a number (duplicate planning, fan-out, registry re-marking), and rows
+    # still waiting for normalize_numbers (dncl_phone IS NULL)
+    'idx_numbers_dncl_phone': """
+        ON numbers(dncl_phone)
+    """,
+    # Dashboard results pages: keyset paging on (dncl_checked_at, id), newest checks first
+    'idx_numbers_checked_page': """
+        ON numbers(dncl_checked_at, id)
+        WHERE dncl_checked_at IS NOT NULL
+    """,
+    # Incremental exports: rows changed after an export's watermark
+    'idx_numbers_change_seq': """
+        ON numbers(dncl_change_seq)
+        WHERE dncl_change_seq IS NOT NULL
+    """,
+}
+
+def _counts_as_mobile(row: str) -> str:
+    """SQL 1/0 for whether a row counts towards the mobile progress totals"""
+    return f"CASE WHEN {row}.telephone IS NOT NULL AND {row}.phone_type = 'MOBILE' THEN 1 ELSE 0 END"
+
+def _counts_as_checked(row: str) -> str:
+    """SQL 1/0 for whether a row has a result to show on the dashboard"""
+    return f"CASE WHEN {row}.dncl_checked_at IS NOT NULL THEN 1 ELSE 0 END"
+
+# Triggers keeping dncl_progress in step with numbers inside the writing transaction,
+# whichever code path (Python, the JS tool, manual SQL) changes the rows
+PROGRESS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_dncl_progress_insert AFTER INSERT ON numbers
+    BEGIN
+        INSERT INTO dncl_progress (dncl_status, mobile_count, checked_count)
+        VALUES (IFNULL(NEW.dncl_status, ''), {_counts_as_mobile('NEW')}, {_counts_as_checked('NEW')})
+        ON CONFLICT(dncl_status) DO UPDATE SET
+            mobile_count = mobile_count + excluded.mobile_count,
+            checked_count = checked_count + excluded.checked_count;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_dncl_progress_delete AFTER DELETE ON numbers
+    BEGIN
+        UPDATE dncl_progress SET
+            mobile_count = mobile_count - {_counts_as_mobile('OLD')},
+            checked_count = checked_count - {_counts_as_checked('OLD')}
+        WHERE dncl_status = IFNULL(OLD.dncl_status, '');
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_dncl_progress_update
+    AFTER UPDATE OF dncl_status, dncl_checked_at, telephone, phone_type ON numbers
+    WHEN OLD.dncl_status IS NOT NEW.dncl_status
+        OR OLD.dncl_checked_at IS NOT NEW.dncl_checked_at
+        OR OLD.telephone IS NOT NEW.telephone
+        OR OLD.phone_type IS NOT NEW.phone_type
+    BEGIN
+        UPDATE dncl_progress SET
+            mobile_count = mobile_count - {_counts_as_mobile('OLD')},
+            checked_count = checked_count - {_counts_as_checked('OLD')}
+        WHERE dncl_status = IFNULL(OLD.dncl_status, '');
+        INSERT INTO dncl_progress (dncl_status, mobile_count, checked_count)
+        VALUES (IFNULL(NEW.dncl_status, ''), {_counts_as_mobile('NEW')}, {_counts_as_checked('NEW')})
+        ON CONFLICT(dncl_status) DO UPDATE SET
+            mobile_count = mobile_count + excluded.mobile_count,
+            checked_count = checked_count + excluded.checked_count;
+    END
+    """,
+]
+
+# dncl_status values that are an answer for the row; PROCESSING (claimed) and DUPLICATE
+# (waiting on another row's check) are not
+RESULT_STATUSES = ('ACTIVE', 'INACTIVE', 'INVALID', 'ERROR')
+
+# Stamps a row with the next change sequence number whenever its DNCL result changes.
+# The counter is bumped inside the writing transaction, so sequence order is commit order
+# and an export that saw sequence N has seen every change up to N. Only a row gaining or
+# losing an answer counts: claims, parked duplicates and a claim being put back
+# (PROCESSING -> NULL) aren't result changes.
+CHANGE_TRACKING_TRIGGER = f"""
+    CREATE TRIGGER IF NOT EXISTS trg_dncl_change_seq
+    AFTER UPDATE OF dncl_status, dncl_registration_date ON numbers
+    WHEN (OLD.dncl_status IS NOT NEW.dncl_status
+        OR OLD.dncl_registration_date IS NOT NEW.dncl_registration_date)
+        AND (NEW.dncl_status IN {RESULT_STATUSES} OR OLD.dncl_status IN {RESULT_STATUSES})
+    BEGIN
+        UPDATE dncl_change_counter SET change_seq = change_seq + 1 WHERE id = 1;
+        UPDATE numbers SET dncl_change_seq = (SELECT change_seq FROM dncl_change_counter WHERE id = 1)
+        WHERE rowid = NEW.rowid;
+    END
+"""
+
+# How long a stored answer can stand in for a new check (the DNCL asks for a 31-day re-check)
+RESULT_CACHE_TTL_DAYS = float(os.getenv('DNCL_CACHE_TTL_DAYS', 31))
+
+# How long a claimed row stays reserved for its worker (a check can retry for a few minutes)
+DEFAULT_LEASE_SECONDS = 600
+
+def default_worker_id() -> str:
+    """Identify this process as host:pid in the dncl_claimed_by column"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def numbers_table_exists(db_path: str) -> bool:
+    """True when db_path is an existing SQLite database with a numbers table; never creates the file"""
+    if not os.path.isfile(db_path):
+        return False
+    try:
+        conn = sqlite3.connect(Path(db_path).resolve().as_uri() + '?mode=ro', uri=True)
+        try:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'numbers'"
+            ).fetchone() is not None
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return False  # Not a SQLite file
+
+class DatabaseManager:
+    """
+    Data access for the numbers table. Connections are long-lived and pooled (WAL mode),
+    so the processing loop and the progress server can share one manager across threads.
+    """
+
+    POOL_SIZE = 4
+
+    def __init__(self, db_path: str = "../numbers.db"):
+        # Use relative path to access database in parent directory
+        self.db_path = db_path
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=self.POOL_SIZE)
+        self.setup_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection with the pragmas every pooled connection uses"""
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # WAL lets the progress server read while the processing loop writes
+        conn.execute("PRAGMA journal_mode = WAL")
+        # Safe with WAL: only the last transactions can be lost on power failure, never corruption
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA cache_size = -65536")  # 64 MB page cache per connection
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection, opening one if the pool is empty"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()  # Never hand a half-finished transaction to the next caller
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        """Close every pooled connection"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+    
+    def setup_database(self):
+        """Add DNCL-related columns if they don't exist"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Add new columns if they don't exist
+            try:
+                cursor.execute("""
+                    ALTER TABLE numbers 
+                    ADD COLUMN dncl_status TEXT
+                """)
+            except sqlite3.OperationalError:
+                pass  # Column already exists
+                
+            try:
+                cursor.execute("""
+                    ALTER TABLE numbers 
+                    ADD COLUMN dncl_registration_date TEXT
+                """)
+            except sqlite3.OperationalError:
+                pass
+                
+            try:
+                cursor.execute("""
+                    ALTER TABLE numbers 
+                    ADD COLUMN dncl_checked_at TEXT
+                """)
+            except sqlite3.OperationalError:
+                pass  # Column already exists
+
+            # Work-claim columns: who is checking a PROCESSING row and until when (epoch seconds)
+            try:
+                cursor.execute("""
+                    ALTER TABLE numbers 
+                    ADD COLUMN dncl_claimed_by TEXT
+                """)
+            except sqlite3.OperationalError:
+                pass
+
+            try:
+                cursor.execute("""
+                    ALTER TABLE numbers 
+                    ADD COLUMN dncl_lease_expires_at REAL
+                """)
+            except sqlite3.OperationalError:
+                pass
+
+            # Canonical 10-digit number filled by normalize_numbers ('' when it can't be checked)
+            try:
+                cursor.execute("""
+                    ALTER TABLE numbers 
+                    ADD COLUMN dncl_phone TEXT
+                """)
+            except sqlite3.OperationalError:
+                pass
+
+            # Sequence number of the row's last result change (see CHANGE_TRACKING_TRIGGER)
+            try:
+                cursor.execute("""
+                    ALTER TABLE numbers 
+                    ADD COLUMN dncl_change_seq INTEGER
+                """)
+            except sqlite3.OperationalError:
+                pass
+
+            # Latest answer per normalized number, shared by every row with that number
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS dncl_result_cache (
+                    number TEXT PRIMARY KEY,
+                    dncl_status TEXT NOT NULL,
+                    dncl_registration_date TEXT,
+                    checked_at TEXT NOT NULL
+                )
+            """)
+
+            self._ensure_indexes(cursor)
+            self._ensure_progress_counters(cursor)
+            self._ensure_change_tracking(cursor)
+                
+            conn.commit()
+
+    def _ensure_indexes(self, cursor: sqlite3.Cursor):
+        """Create any missing index from NUMBERS_INDEXES, then refresh planner statistics"""
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'numbers'")
+        existing = {row[0] for row in cursor.fetchall()}
+
+        created = False
+        for name, definition in NUMBERS_INDEXES.items():
+            if name in existing:
+                continue
+            try:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} {definition}")
+                created = True
+            except sqlite3.OperationalError:
+                pass  # numbers table (or one of its columns) doesn't exist yet
+
+        if created:
+            # Partial indexes are only picked once the planner has statistics for them
+            cursor.execute("ANALYZE numbers")
+    
+    def _ensure_progress_counters(self, cursor: sqlite3.Cursor):
+        """Create and seed the dncl_progress table and the triggers that keep it current"""
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('numbers', 'dncl_progress')")
+        tables = {row[0] for row in cursor.fetchall()}
+        if 'numbers' not in tables:
+            return
+        # The counters and triggers are defined over telephone and phone_type; a table
+        # imported without them has nothing to count
+        cursor.execute("PRAGMA table_info(numbers)")
+        if not {'telephone', 'phone_type'} <= {row[1].lower() for row in cursor.fetchall()}:
+            return
+
+        if 'dncl_progress' not in tables:
+            cursor.execute("""
+                CREATE TABLE dncl_progress (
+                    dncl_status TEXT PRIMARY KEY,  -- '' for pending (NULL or empty) rows
+                    mobile_count INTEGER NOT NULL DEFAULT 0,
+                    checked_count INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self._seed_progress_counters(cursor)
+
+        for statement in PROGRESS_TRIGGERS:
+            cursor.execute(statement)
+
+    def _ensure_change_tracking(self, cursor: sqlite3.Cursor):
+        """Create the change counter, the export watermark table and the trigger stamping rows"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'numbers'")
+        if cursor.fetchone() is None:
+            return
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dncl_change_counter (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                change_seq INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO dncl_change_counter (id, change_seq) VALUES (1, 0)")
+        # Last change sequence each export target has written out
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dncl_export_watermarks (
+                target TEXT PRIMARY KEY,
+                change_seq INTEGER NOT NULL,
+                exported_at TEXT NOT NULL
+            )
+        """)
+        # Recreated every start so databases keep up with changes to its WHEN clause
+        cursor.execute("DROP TRIGGER IF EXISTS trg_dncl_change_seq")
+        cursor.execute(CHANGE_TRACKING_TRIGGER)
+
+    @staticmethod
+    def current_change_seq(conn: sqlite3.Connection) -> int:
+        """Latest change sequence number visible to conn's current transaction"""
+        row = conn.execute("SELECT change_seq FROM dncl_change_counter WHERE id = 1").fetchone()
+        return row[0] if row else 0
+
+    def get_export_watermark(self, target: str) -> Optional[int]:
+        """Change sequence the last export to target covered, or None if it never ran"""
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT change_seq FROM dncl_export_watermarks WHERE target = ?", (target,)
+            ).fetchone()
+            return row[0] if row else None
+
+    def set_export_watermark(self, target: str, change_seq: int):
+        """Record that target now holds every change up to change_seq"""
+        with self.connection() as conn:
+            conn.execute("""
+                INSERT INTO dncl_export_watermarks (target, change_seq, exported_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(target) DO UPDATE SET
+                    change_seq = excluded.change_seq,
+                    exported_at = excluded.exported_at
+            """, (target, change_seq, datetime.now().isoformat()))
+            conn.commit()
+
+    def _seed_progress_counters(self, cursor: sqlite3.Cursor):
+        """Recount dncl_progress from the numbers table (one full scan)"""
+        cursor.execute("DELETE FROM dncl_progress")
+        cursor.execute(f"""
+            INSERT INTO dncl_progress (dncl_status, mobile_count, checked_count)
+            SELECT
+                IFNULL(dncl_status, ''),
+                SUM({_counts_as_mobile('numbers')}),
+                SUM({_counts_as_checked('numbers')})
+            FROM numbers
+            GROUP BY IFNULL(dncl_status, '')
+        """)
+
+    def rebuild_progress_counts(self):
+        """Recount dncl_progress from scratch, e.g. after rows were changed with triggers disabled"""
+        with self.connection() as conn:
+            self._seed_progress_counters(conn.cursor())
+            conn.commit()
+
+    def get_progress_counts(self) -> Dict[str, Dict[str, int]]:
+        """
+        Read the maintained counters: {dncl_status: {'mobile': n, 'checked': n}} with '' for
+        pending rows. O(1) however large the numbers table is.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT dncl_status, mobile_count, checked_count FROM dncl_progress")
+            return {
+                row['dncl_status']: {'mobile': row['mobile_count'], 'checked': row['checked_count']}
+                for row in cursor.fetchall()
+            }
+
+    def get_next_engineer(self, worker_id: Optional[str] = None) -> Optional[Dict]:
+        """Get next engineer with null DNCL status and mobile phone"""
+        engineers = self.claim_batch(1, worker_id)
+        if engineers:
+            return engineers[0]
+        return None
+
+    def claim_batch(self, n: int, worker_id: Optional[str] = None,
+                    lease_seconds: float = DEFAULT_LEASE_SECONDS) -> List[Dict]:
+        """
+        Atomically claim up to n pending mobile numbers for worker_id, leased for lease_seconds.
+        Rows left in PROCESSING by a worker whose lease ran out (or by a crash before leases
+        existed) are claimable again, so several processes can share one database.
+        """
+        if worker_id is None:
+            worker_id = default_worker_id()
+        now = time.time()
+
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE numbers 
+                SET dncl_status = 'PROCESSING',
+                    dncl_claimed_by = ?,
+                    dncl_lease_expires_at = ?
+                WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id 
+                        FROM numbers 
+                        WHERE dncl_status = 'PROCESSING'
+                        AND (dncl_lease_expires_at IS NULL OR dncl_lease_expires_at < ?)
+                        AND telephone IS NOT NULL 
+                        AND phone_type = 'MOBILE'
+                        UNION ALL
+                        SELECT id 
+                        FROM numbers 
+                        WHERE (dncl_status IS NULL OR dncl_status = '')
+                        AND telephone IS NOT NULL 
+                        AND phone_type = 'MOBILE'
+                    )
+                    LIMIT ?
+                )
+                RETURNING id, telephone, nom, prenom
+            """, (worker_id, now + lease_seconds, now, n))
+            
+            rows = cursor.fetchall()
+            conn.commit()
+        
+        return [dict(row) for row in rows]
+    
+    def get_unprocessed_count(self) -> int:
+        """Get count of remaining unprocessed numbers"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Maintained by the dncl_progress triggers instead of a COUNT(*) over numbers
+            cursor.execute("""
+                SELECT mobile_count 
+                FROM dncl_progress 
+                WHERE dncl_status = ''
+            """)
+            
+            row = cursor.fetchone()
+            return row[0] if row else 0
+    
+    @staticmethod
+    def _dncl_status_values(dncl_result: Dict) -> Tuple[str, Optional[str]]:
+        """Map an API/registry response to (dncl_status, dncl_registration_date)"""
+        if dncl_result.get('status') == 'INVALID':
+            return 'INVALID', None
+        if dncl_result.get('status') == 'ERROR':
+            return 'ERROR', None
+        status = 'ACTIVE' if dncl_result.get('Active', False) else 'INACTIVE'
+        return status, dncl_result.get('AddedAt')
+
+    def update_engineer_dncl_status(self, engineer_id: int, dncl_result: Dict, worker_id: Optional[str] = None) -> int:
+        """Update engineer's DNCL status based on API response; returns 0 if the claim was lost"""
+        return self.bulk_update_dncl_status([(engineer_id, dncl_result)], worker_id)
+
+    def bulk_update_dncl_status(self, results: Iterable[Tuple[int, Dict]], worker_id: Optional[str] = None) -> int:
+        """
+        Write many (engineer_id, dncl_result) pairs in a single transaction, one commit
+        for the whole batch. A row whose lease ran out and that another worker has claimed
+        since is left to that worker. Returns the number of results written.
+        """
+        if worker_id is None:
+            worker_id = default_worker_id()
+        current_time = datetime.now().isoformat()
+        rows = []
+        fresh_ids = []
+        for engineer_id, dncl_result in results:
+            rows.append((*self._dncl_status_values(dncl_result), current_time, engineer_id, worker_id))
+            if not dncl_result.get('cached'):
+                fresh_ids.append((engineer_id,))
+        if not rows:
+            return 0
+
+        with self.connection() as conn:
+            # Unclaimed rows (results written without a claim, rows claimed before leases
+            # existed) are still written
+            written = conn.executemany("""
+                UPDATE numbers 
+                SET dncl_status = ?,
+                    dncl_registration_date = ?,
+                    dncl_checked_at = ?,
+                    dncl_claimed_by = NULL,
+                    dncl_lease_expires_at = NULL
+                WHERE id = ?
+                AND (dncl_claimed_by IS NULL OR dncl_claimed_by = ?)
+            """, rows).rowcount
+            # Hand the answer to the rows plan_duplicates parked behind this one
+            conn.executemany("""
+                UPDATE numbers 
+                SET dncl_status = ?,
+                    dncl_registration_date = ?,
+                    dncl_checked_at = ?
+                WHERE dncl_status = 'DUPLICATE'
+                AND dncl_phone = (
+                    SELECT checked.dncl_phone
+                    FROM numbers AS checked
+                    WHERE checked.id = ?
+                    AND checked.dncl_claimed_by IS NULL
+                )
+            """, [row[:4] for row in rows])
+            # Remember fresh answers for other rows sharing the number (not the ones served
+            # from the cache, or the entry's age would never grow)
+            conn.executemany("""
+                INSERT INTO dncl_result_cache (number, dncl_status, dncl_registration_date, checked_at)
+                SELECT dncl_phone, dncl_status, dncl_registration_date, dncl_checked_at
+                FROM numbers
+                WHERE id = ?
+                AND dncl_phone <> ''
+                AND dncl_status IN ('ACTIVE', 'INACTIVE', 'INVALID')
+                ON CONFLICT(number) DO UPDATE SET
+                    dncl_status = excluded.dncl_status,
+                    dncl_registration_date = excluded.dncl_registration_date,
+                    checked_at = excluded.checked_at
+            """, fresh_ids)
+            conn.commit()
+        return written
+
+    def normalize_numbers(self, batch_size: int = 10000) -> Tuple[int, int]:
+        """
+        Pre-run validation: fill dncl_phone for every row not normalized yet, a whole batch
+        at a time, and mark pending mobile rows whose number isn't a valid Canadian number
+        INVALID right away so they never reach the work queue.
+        Returns (rows_normalized, rows_marked_invalid).
+        """
+        normalized_count = 0
+        invalid_count = 0
+        last_id = 0
+
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            while True:
+                cursor.execute("""
+                    SELECT id, telephone
+                    FROM numbers
+                    WHERE dncl_phone IS NULL
+                    AND telephone IS NOT NULL
+                    AND id > ?
+                    ORDER BY id
+                    LIMIT ?
+                """, (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+
+                numbers = normalize_phone_column(row['telephone'] for row in rows)
+                cursor.executemany(
+                    "UPDATE numbers SET dncl_phone = ? WHERE id = ?",
+                    [(number or '', row['id']) for row, number in zip(rows, numbers)]
+                )
+
+                current_time = datetime.now().isoformat()
+                cursor.executemany("""
+                    UPDATE numbers 
+                    SET dncl_status = 'INVALID',
+                        dncl_checked_at = ?
+                    WHERE id = ?
+                    AND (dncl_status IS NULL OR dncl_status = '')
+                    AND phone_type = 'MOBILE'
+                """, [(current_time, row['id']) for row, number in zip(rows, numbers) if number is None])
+                invalid_count += cursor.rowcount
+                normalized_count += len(rows)
+                conn.commit()
+
+            if normalized_count:
+                # Statistics gathered while dncl_phone was still NULL make idx_numbers_dncl_phone
+                # look useless, and the duplicate/fan-out lookups fall back to table scans.
+                # A sampled ANALYZE is enough for the planner and cheap on large tables.
+                cursor.execute("PRAGMA analysis_limit = 1000")
+                cursor.execute("ANALYZE numbers")
+                cursor.execute("PRAGMA analysis_limit = 0")
+                conn.commit()
+
+        return normalized_count, invalid_count
+
+    def plan_duplicates(self) -> int:
+        """
+        Pre-run planning: of all pending mobile rows sharing a normalized number, leave only
+        the lowest id pending and park the rest as DUPLICATE. Writing the kept row's result
+        fans it out to the parked rows, so each distinct number is looked up once.
+        Returns the number of rows parked.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE numbers 
+                SET dncl_status = 'DUPLICATE'
+                WHERE (dncl_status IS NULL OR dncl_status = '')
+                AND telephone IS NOT NULL 
+                AND phone_type = 'MOBILE'
+                AND dncl_phone <> ''
+                AND EXISTS (
+                    SELECT 1
+                    FROM numbers AS first
+                    WHERE first.dncl_phone = numbers.dncl_phone
+                    AND first.id < numbers.id
+                    AND (first.dncl_status IS NULL OR first.dncl_status IN ('', 'PROCESSING'))
+                    AND first.phone_type = 'MOBILE'
+                )
+            """)
+            parked = cursor.rowcount
+            conn.commit()
+        return parked
+
+    def fill_from_cache(self, max_age_days: Optional[float] = None) -> int:
+        """
+        Pre-run planning: answer every pending mobile row whose number has a fresh cached
+        result in one UPDATE. Returns the number of rows filled.
+        """
+        if max_age_days is None:
+            max_age_days = RESULT_CACHE_TTL_DAYS
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+        current_time = datetime.now().isoformat()
+
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE numbers 
+                SET dncl_status = cache.dncl_status,
+                    dncl_registration_date = cache.dncl_registration_date,
+                    dncl_checked_at = ?
+                FROM dncl_result_cache AS cache
+                WHERE cache.number = numbers.dncl_phone
+                AND cache.checked_at >= ?
+                AND (numbers.dncl_status IS NULL OR numbers.dncl_status IN ('', 'DUPLICATE'))
+                AND numbers.telephone IS NOT NULL 
+                AND numbers.phone_type = 'MOBILE'
+            """, (current_time, cutoff))
+            filled = cursor.rowcount
+            conn.commit()
+        return filled
+
+    def get_cached_result(self, phone: str, max_age_days: Optional[float] = None) -> Optional[Dict]:
+        """
+        Return a result for phone from the result cache if one was stored less than
+        max_age_days ago (DNCL_CACHE_TTL_DAYS by default), in the shape send_dncl_request returns.
+        """
+        if max_age_days is None:
+            max_age_days = RESULT_CACHE_TTL_DAYS
+        number = format_phone_number(phone)
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+
+        with self.connection() as conn:
+            row = conn.execute("""
+                SELECT dncl_status, dncl_registration_date
+                FROM dncl_result_cache
+                WHERE number = ?
+                AND checked_at >= ?
+            """, (number, cutoff)).fetchone()
+
+        if row is None:
+            return None
+        if row['dncl_status'] == 'INVALID':
+            return {'Phone': number, 'status': 'INVALID', 'error': 'Invalid number (cached)', 'cached': True}
+        return {
+            'Phone': number,
+            'Active': row['dncl_status'] == 'ACTIVE',
+            'AddedAt': row['dncl_registration_date'],
+            'cached': True
+        }
+    
+    def reset_engineer_status(self, engineer_id: int, worker_id: Optional[str] = None):
+        """Reset an engineer's DNCL status back to null, if worker_id still holds its claim"""
+        if worker_id is None:
+            worker_id = default_worker_id()
+        with self.connection() as conn:
+            conn.execute("""
+                UPDATE numbers 
+                SET dncl_status = NULL,
+                    dncl_claimed_by = NULL,
+                    dncl_lease_expires_at = NULL
+                WHERE id = ?
+                AND dncl_status = 'PROCESSING'
+                AND dncl_claimed_by = ?
+            """, (engineer_id, worker_id))
+            conn.commit()
+
+    def apply_registry_changes(self, changes: Dict[str, Tuple[bool, Optional[str]]]) -> int:
+        """
+        Re-mark already checked rows whose number was added to or removed from the registry.
+        changes maps a normalized 10-digit number to (is_active, registration_date).
+        Returns the number of rows updated.
+        """
+        if not changes:
+            return 0
+
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS registry_changes (
+                    number TEXT PRIMARY KEY,
+                    status TEXT,
+                    registration_date TEXT
+                )
+            """)
+            cursor.execute("DELETE FROM registry_changes")
+            cursor.executemany(
+                "INSERT INTO registry_changes VALUES (?, ?, ?)",
+                [
+                    (number, 'ACTIVE' if is_active else 'INACTIVE', added_at if is_active else None)
+                    for number, (is_active, added_at) in changes.items()
+                ]
+            )
+
+            current_time = datetime.now().isoformat()
+            # Pending rows pick the change up on their first check; INVALID/ERROR rows are left alone
+            cursor.execute("""
+                UPDATE numbers
+                SET dncl_status = (
+                        SELECT status FROM registry_changes WHERE number = dncl_phone
+                    ),
+                    dncl_registration_date = (
+                        SELECT registration_date FROM registry_changes WHERE number = dncl_phone
+                    ),
+                    dncl_checked_at = ?
+                WHERE dncl_status IN ('ACTIVE', 'INACTIVE')
+                AND dncl_phone IN (SELECT number FROM registry_changes)
+            """, (current_time,))
+            updated = cursor.rowcount
+
+            # The registry is the newer truth for these numbers
+            cursor.execute("""
+                INSERT INTO dncl_result_cache (number, dncl_status, dncl_registration_date, checked_at)
+                SELECT number, status, registration_date, ?
+                FROM registry_changes
+                WHERE true
+                ON CONFLICT(number) DO UPDATE SET
+                    dncl_status = excluded.dncl_status,
+                    dncl_registration_date = excluded.dncl_registration_date,
+                    checked_at = excluded.checked_at
+            """, (current_time,))
+
+            cursor.execute("DELETE FROM registry_changes")
+            conn.commit()
+        return updated
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintenance for the numbers database")
+    parser.add_argument('--db', default='../numbers.db')
+    parser.add_argument('--rebuild-progress', action='store_true',
+                        help="Recount the dncl_progress table from the numbers table (after manual edits "
+                             "made with the triggers dropped, or if the dashboard totals look wrong)")
+    args = parser.parse_args()
+
+    if not args.rebuild_progress:
+        parser.print_help()
+    elif not numbers_table_exists(args.db):
+        parser.error(f"No numbers table in {args.db}")
+    else:
+        db = DatabaseManager(args.db)
+        db.rebuild_progress_counts()
+        counts = db.get_progress_counts()
+        print(f"Rebuilt progress counts for {sum(c['mobile'] for c in counts.values())} mobile rows in {args.db}")
+        db.close()
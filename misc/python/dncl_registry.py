@@ -0,0 +1,709 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from database_manager import DatabaseManager, numbers_table_exists
+from registry_filter import RegistryFilter, filter_path, index_fingerprint, measure_false_positive_rate
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, lookups fall back to bisect over the arrays
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: the build lock falls back to msvcrt byte-range locking
+    fcntl = None
+    import msvcrt
+
+# Extensions of the area-code files handed out by the National DNCL subscription
+REGISTRY_FILE_EXTENSIONS = ('.txt', '.csv')
+
+# Date column value for a registration whose date isn't in the registry file
+NO_DATE = 0
+
+# On-disk index layout (little-endian): header, the NPA-NXX directory, the byte offset of
+# each exchange's block in the key stream, count uint32 dates, then the key stream
+INDEX_MAGIC = b'DNCLIDX1'
+INDEX_VERSION = 3
+# magic, version, snapshot time (epoch seconds of the newest source or delta file, 0 if unknown), count
+INDEX_HEADER = struct.Struct('<8sIIQ')
+
+# NPA-NXX directory: entry p is the offset of the first key whose first six digits are >= p,
+# so the keys of exchange p are keys[directory[p]:directory[p + 1]]
+EXCHANGE_WIDTH = 10000  # Numbers per NPA-NXX exchange (the last four digits)
+DIRECTORY_SIZE = 1000000  # Every possible six-digit prefix
+
+# Key stream: each exchange's block holds only the last four digits of its numbers, as the
+# gaps between consecutive numbers (the first one from 0), each a 1-2 byte varint
+VARINT_CONTINUATION = 0x80
+
+# Decoded exchange blocks kept per open index (a few KB each)
+DECODE_CACHE_BLOCKS = 1024
+
+# Operation markers accepted at the start of a delta file line
+DELTA_ADD_OPS = {'A', 'ADD', 'I', 'INSERT', '+'}
+DELTA_DELETE_OPS = {'D', 'DEL', 'DELETE', 'R', 'REMOVE', '-'}
+
+def normalize_registry_number(raw: str) -> Optional[str]:
+    """Reduce a registry or lookup value to the bare 10-digit number, or None if it isn't one"""
+    if len(raw) == 10 and raw.isdigit():
+        return raw  # Already normalized (phone_numbers output), the common case for batch lookups
+    digits = ''.join(ch for ch in raw.strip() if ch.isdigit())
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    if len(digits) != 10:
+        return None
+    return digits
+
+def split_registry_fields(line: str) -> List[str]:
+    """Split a registry line on whichever delimiter it uses"""
+    for delimiter in (',', '\t', ';', '|'):
+        if delimiter in line:
+            return [field.strip() for field in line.split(delimiter)]
+    return [line]
+
+def parse_registry_line(line: str) -> Optional[Tuple[str, Optional[str]]]:
+    """Parse one registry line of the form `number[,registration_date]`"""
+    line = line.strip()
+    if not line or not line[0].isdigit():
+        return None  # Blank line or header row
+
+    fields = split_registry_fields(line)
+    number = normalize_registry_number(fields[0])
+    if number is None:
+        return None
+    added_at = fields[1] if len(fields) > 1 and fields[1] else None
+    return number, added_at
+
+def iter_registry_files(path: Union[str, Path]) -> List[Path]:
+    """List the registry files at path (a single file or a directory of area-code files)"""
+    path = Path(path)
+    if path.is_file():
+        return [path]
+    if not path.is_dir():
+        raise FileNotFoundError(f"DNCL registry not found at {path.absolute()}")
+    return sorted(
+        p for p in path.iterdir()
+        if p.is_file() and p.suffix.lower() in REGISTRY_FILE_EXTENSIONS
+    )
+
+def iter_registry_entries(path: Union[str, Path]) -> Iterator[Tuple[str, Optional[str]]]:
+    """Stream (number, registration_date) pairs out of every registry file under path"""
+    for file_path in iter_registry_files(path):
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                entry = parse_registry_line(line)
+                if entry is not None:
+                    yield entry
+
+def encode_registration_date(added_at: Optional[str]) -> int:
+    """Pack a registration timestamp into the uint32 date column (seconds since epoch, 0 = unknown)"""
+    if not added_at:
+        return NO_DATE
+    try:
+        parsed = datetime.fromisoformat(added_at.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return NO_DATE
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return min(max(int(parsed.timestamp()), NO_DATE), 0xFFFFFFFF)
+
+def decode_registration_date(value: int) -> Optional[str]:
+    """Turn a date column value back into the ISO string the API returns as AddedAt"""
+    if value == NO_DATE:
+        return None
+    return datetime.fromtimestamp(value, tz=timezone.utc).isoformat()
+
+def _sort_unique(keys: array, dates: array) -> Tuple[array, array]:
+    """Sort the parallel columns by number, keeping the last entry seen for a duplicated number"""
+    if np is not None:
+        key_view = np.frombuffer(keys, dtype=np.uint64)
+        date_view = np.frombuffer(dates, dtype=np.uint32)
+        order = np.argsort(key_view, kind='stable')
+        key_view = key_view[order]
+        date_view = date_view[order]
+        keep = np.ones(len(key_view), dtype=bool)
+        keep[:-1] = key_view[1:] != key_view[:-1]
+        return array('Q', key_view[keep].tobytes()), array('I', date_view[keep].tobytes())
+
+    sorted_keys = array('Q')
+    sorted_dates = array('I')
+    for i in sorted(range(len(keys)), key=keys.__getitem__):
+        if sorted_keys and sorted_keys[-1] == keys[i]:
+            sorted_dates[-1] = dates[i]
+        else:
+            sorted_keys.append(keys[i])
+            sorted_dates.append(dates[i])
+    return sorted_keys, sorted_dates
+
+def build_directory(keys) -> array:
+    """NPA-NXX directory (DIRECTORY_SIZE + 1 uint32 offsets) for a sorted key array"""
+    if np is not None:
+        bounds = np.arange(DIRECTORY_SIZE + 1, dtype=np.uint64) * np.uint64(EXCHANGE_WIDTH)
+        offsets = np.searchsorted(np.frombuffer(keys, dtype=np.uint64), bounds)
+        return array('I', offsets.astype(np.uint32).tobytes())
+
+    # One bisect per occupied exchange rather than one step per key
+    directory = array('I', bytes(4 * (DIRECTORY_SIZE + 1)))
+    count = len(keys)
+    i = 0
+    next_prefix = 0
+    while i < count:
+        prefix = keys[i] // EXCHANGE_WIDTH
+        for p in range(next_prefix, prefix + 1):
+            directory[p] = i
+        next_prefix = prefix + 1
+        i = bisect_left(keys, next_prefix * EXCHANGE_WIDTH, i)
+    for p in range(next_prefix, DIRECTORY_SIZE + 1):
+        directory[p] = count
+    return directory
+
+def encode_key_blocks(keys, directory) -> Tuple[bytes, array]:
+    """
+    Delta/varint-encode a sorted key array exchange by exchange. Returns the key stream and
+    DIRECTORY_SIZE + 1 byte offsets: exchange p is stream[offsets[p]:offsets[p + 1]].
+    """
+    if np is not None:
+        key_view = np.frombuffer(keys, dtype=np.uint64)
+        prefixes = key_view // np.uint64(EXCHANGE_WIDTH)
+        gaps = key_view % np.uint64(EXCHANGE_WIDTH)
+        same_block = prefixes[1:] == prefixes[:-1]
+        gaps[1:][same_block] -= gaps[:-1][same_block]
+        wide = gaps >= VARINT_CONTINUATION
+        byte_starts = np.zeros(len(gaps) + 1, dtype=np.int64)
+        np.cumsum(1 + wide, out=byte_starts[1:])
+        stream = np.empty(int(byte_starts[-1]), dtype=np.uint8)
+        stream[byte_starts[:-1]] = np.where(wide, (gaps & np.uint64(0x7F)) | np.uint64(VARINT_CONTINUATION), gaps)
+        stream[byte_starts[:-1][wide] + 1] = gaps[wide] >> np.uint64(7)
+        offsets = byte_starts[np.frombuffer(directory, dtype=np.uint32)]
+        return stream.tobytes(), array('I', offsets.astype(np.uint32).tobytes())
+
+    stream = bytearray()
+    offsets = array('I')
+    for prefix in range(DIRECTORY_SIZE):
+        offsets.append(len(stream))
+        previous = prefix * EXCHANGE_WIDTH
+        for i in range(directory[prefix], directory[prefix + 1]):
+            gap = keys[i] - previous
+            previous = keys[i]
+            if gap < VARINT_CONTINUATION:
+                stream.append(gap)
+            else:
+                stream.append((gap & 0x7F) | VARINT_CONTINUATION)
+                stream.append(gap >> 7)
+    offsets.append(len(stream))
+    return bytes(stream), offsets
+
+def _decode_gaps(data):
+    """The varints of a stretch of the key stream as a NumPy array (sum them as uint64)"""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    wide_bytes = raw >= VARINT_CONTINUATION
+    if not wide_bytes.any():
+        return raw  # Every gap under 128, the usual case in a populated exchange
+    # A byte starts a varint unless the byte before it carries the continuation bit
+    starts = np.ones(len(raw), dtype=bool)
+    starts[1:] = ~wide_bytes[:-1]
+    positions = np.flatnonzero(starts)
+    gaps = (raw[positions] & 0x7F).astype(np.uint64)
+    wide = wide_bytes[positions]
+    gaps[wide] |= raw[positions[wide] + 1].astype(np.uint64) << np.uint64(7)
+    return gaps
+
+def decode_key_block(data, prefix: int) -> array:
+    """The sorted keys of exchange prefix from its encoded block"""
+    base = prefix * EXCHANGE_WIDTH
+    if np is not None:
+        keys = np.cumsum(_decode_gaps(data), dtype=np.uint64)
+        keys += np.uint64(base)
+        return array('Q', keys.tobytes())
+
+    keys = array('Q')
+    key = base
+    i = 0
+    while i < len(data):
+        gap = data[i]
+        i += 1
+        if gap & VARINT_CONTINUATION:
+            gap = (gap & 0x7F) | (data[i] << 7)
+            i += 1
+        key += gap
+        keys.append(key)
+    return keys
+
+def parse_delta_line(line: str) -> Optional[Tuple[str, bool, Optional[str]]]:
+    """
+    Parse one delta line: `A,number[,registration_date]` for an addition, `D,number` for a
+    deletion (`+number` / `-number` work too). Returns (number, is_addition, registration_date).
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    if line[0] in '+-':
+        op, rest = line[0], line[1:]
+    else:
+        fields = split_registry_fields(line)
+        op, rest = fields[0].upper(), ','.join(fields[1:])
+
+    if op in DELTA_ADD_OPS:
+        is_addition = True
+    elif op in DELTA_DELETE_OPS:
+        is_addition = False
+    else:
+        return None  # Header row or unknown operation
+
+    entry = parse_registry_line(rest)
+    if entry is None:
+        return None
+    number, added_at = entry
+    return number, is_addition, added_at
+
+def read_delta(delta_path: Union[str, Path]) -> Dict[str, Tuple[bool, Optional[str]]]:
+    """Collapse a delta file into {number: (is_active, registration_date)}, last line wins"""
+    changes: Dict[str, Tuple[bool, Optional[str]]] = {}
+    with open(delta_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            entry = parse_delta_line(line)
+            if entry is not None:
+                number, is_addition, added_at = entry
+                changes[number] = (is_addition, added_at if is_addition else None)
+    return changes
+
+class DNCLRegistry:
+    """
+    Local copy of the National DNCL registry: every number is a uint64 in a sorted array
+    with a parallel uint32 registration-date column, searched with binary search. An index
+    opened from disk keeps the numbers delta-encoded per NPA-NXX exchange and decodes the
+    blocks it searches (the recently used ones stay cached). It also maps its Bloom filter,
+    which turns away most unregistered numbers of a batch lookup before the search.
+    """
+
+    def __init__(self, keys=None, dates=None, mapping: Optional[mmap.mmap] = None,
+                 key_filter: Optional[RegistryFilter] = None, directory=None,
+                 blocks=None, block_offsets=None, snapshot_at: Optional[float] = None):
+        # keys/dates/directory are arrays when built in memory, memoryviews over `mapping`
+        # when opened from disk. An index opened from disk has no keys, only the encoded `blocks`.
+        self.blocks = blocks
+        self.block_offsets = block_offsets
+        self.keys = keys if keys is not None or blocks is not None else array('Q')
+        self.dates = dates if dates is not None else array('I')
+        self.directory = directory if directory is not None else build_directory(self.keys)
+        self._mapping = mapping
+        self.key_filter = key_filter
+        # When the registry data was published (file mtimes), not when the index was built
+        self.snapshot_at = snapshot_at
+        self._decoded: 'OrderedDict[int, array]' = OrderedDict()
+        self._decoded_lock = threading.Lock()
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[str, Optional[str]]]) -> 'DNCLRegistry':
+        """Build the index from (number, registration_date) pairs in any order"""
+        keys = array('Q')
+        dates = array('I')
+        for number, added_at in entries:
+            keys.append(int(number))
+            dates.append(encode_registration_date(added_at))
+        return cls(*_sort_unique(keys, dates))
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'DNCLRegistry':
+        """Load a registry file or a directory of area-code files"""
+        registry = cls.from_entries(iter_registry_entries(path))
+        registry.snapshot_at = max((p.stat().st_mtime for p in iter_registry_files(path)), default=None)
+        return registry
+
+    @classmethod
+    def open(cls, index_path: Union[str, Path]) -> 'DNCLRegistry':
+        """
+        Memory-map an index written by save(). Nothing is parsed or copied, so opening is
+        instant and every process mapping the same file shares one copy in the page cache.
+        """
+        if sys.byteorder != 'little':
+            raise RuntimeError("DNCL registry index files are only supported on little-endian hosts")
+
+        with open(index_path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, snapshot_at, count = INDEX_HEADER.unpack_from(mapping, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            mapping.close()
+            raise ValueError(f"{index_path} is not a DNCL registry index (version {INDEX_VERSION})")
+
+        directory_bytes = (DIRECTORY_SIZE + 1) * 4
+        directory_start = INDEX_HEADER.size
+        offsets_start = directory_start + directory_bytes
+        dates_start = offsets_start + directory_bytes
+        blocks_start = dates_start + count * 4
+        # The last block offset is the length of the key stream
+        stream_length = struct.unpack_from('<I', mapping, dates_start - 4)[0] if len(mapping) >= dates_start else 0
+        index_end = blocks_start + stream_length
+        if len(mapping) < index_end:
+            mapping.close()
+            raise ValueError(f"DNCL registry index {index_path} is truncated")
+
+        view = memoryview(mapping)
+        registry = cls(
+            None, view[dates_start:blocks_start].cast('I'), mapping,
+            directory=view[directory_start:offsets_start].cast('I'),
+            blocks=view[blocks_start:index_end],
+            block_offsets=view[offsets_start:dates_start].cast('I'),
+            snapshot_at=float(snapshot_at) if snapshot_at else None
+        )
+        view.release()
+        # A missing filter, or one left over from another version of the index, is just not used
+        registry.key_filter = RegistryFilter.open(filter_path(index_path), registry.fingerprint())
+        return registry
+
+    def save(self, index_path: Union[str, Path]):
+        """
+        Write the index to disk, atomically replacing any previous file, along with a fresh
+        Bloom filter beside it. The filter carries the index's fingerprint, so a reader
+        catching one file already replaced and the other not yet ignores the filter.
+        """
+        index_path = Path(index_path)
+        keys = self.key_array()
+        RegistryFilter.build(keys).save(filter_path(index_path), self.fingerprint())
+        blocks, block_offsets = encode_key_blocks(keys, self.directory)
+        # A temp file of its own per writer, so concurrent saves never write into each other's file
+        fd, tmp_path = tempfile.mkstemp(dir=index_path.parent, prefix=index_path.name + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, int(self.snapshot_at or 0), len(self)))
+                f.write(self.directory)
+                f.write(block_offsets)
+                f.write(self.dates)
+                f.write(blocks)
+            # Readers that already mapped the old file keep their (unlinked) copy until they close it
+            os.replace(tmp_path, index_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def key_array(self):
+        """Every key as one sorted uint64 array (decodes the whole index when it is encoded)"""
+        if self.keys is not None:
+            return self.keys
+        if np is not None:
+            directory = np.frombuffer(self.directory, dtype=np.uint32)
+            counts = np.diff(directory)
+            # Running sum of the gaps, restarted at every exchange block
+            sums = np.cumsum(_decode_gaps(self.blocks), dtype=np.uint64)
+            block_bases = np.concatenate([np.zeros(1, dtype=np.uint64), sums])[directory[:-1]]
+            prefixes = np.repeat(np.arange(DIRECTORY_SIZE, dtype=np.uint64), counts)
+            keys = prefixes * np.uint64(EXCHANGE_WIDTH) + sums - np.repeat(block_bases, counts)
+            return array('Q', keys.tobytes())
+
+        keys = array('Q')
+        for prefix in range(DIRECTORY_SIZE):
+            if self.directory[prefix + 1] > self.directory[prefix]:
+                keys.extend(self._decode_block(prefix))
+        return keys
+
+    def key_at(self, i: int) -> int:
+        """The i-th smallest key"""
+        if self.keys is not None:
+            return self.keys[i]
+        prefix = bisect_right(self.directory, i) - 1
+        return self._block(prefix)[i - self.directory[prefix]]
+
+    def fingerprint(self) -> int:
+        """Identity of the key set, recorded in the Bloom filter file"""
+        count = len(self)
+        if not count:
+            return index_fingerprint(0, ())
+        return index_fingerprint(count, (self.key_at(0), self.key_at(count // 2), self.key_at(count - 1)))
+
+    def _decode_block(self, prefix: int) -> array:
+        """Decoded keys of one exchange, straight from the key stream"""
+        return decode_key_block(self.blocks[self.block_offsets[prefix]:self.block_offsets[prefix + 1]], prefix)
+
+    def _block(self, prefix: int) -> array:
+        """Decoded keys of one exchange, through a small LRU cache of recently searched blocks"""
+        with self._decoded_lock:
+            block = self._decoded.get(prefix)
+            if block is not None:
+                self._decoded.move_to_end(prefix)
+                return block
+        block = self._decode_block(prefix)
+        with self._decoded_lock:
+            self._decoded[prefix] = block
+            if len(self._decoded) > DECODE_CACHE_BLOCKS:
+                self._decoded.popitem(last=False)
+        return block
+
+    def apply_delta(self, changes: Dict[str, Tuple[bool, Optional[str]]]) -> 'DNCLRegistry':
+        """
+        Return a new in-memory index with a delta (see read_delta) merged in. The existing
+        sorted arrays are merged in one pass instead of re-sorting the whole registry.
+        """
+        removed = {int(number) for number in changes}
+        additions = sorted(
+            (int(number), encode_registration_date(added_at))
+            for number, (is_active, added_at) in changes.items() if is_active
+        )
+
+        current_keys = self.key_array()
+        if np is not None:
+            key_view = np.frombuffer(current_keys, dtype=np.uint64)
+            date_view = np.frombuffer(self.dates, dtype=np.uint32)
+            keep = ~np.isin(key_view, np.fromiter(removed, dtype=np.uint64, count=len(removed)))
+            merged_keys = np.concatenate([key_view[keep], np.array([k for k, _ in additions], dtype=np.uint64)])
+            merged_dates = np.concatenate([date_view[keep], np.array([d for _, d in additions], dtype=np.uint32)])
+            order = np.argsort(merged_keys, kind='stable')
+            return DNCLRegistry(array('Q', merged_keys[order].tobytes()), array('I', merged_dates[order].tobytes()))
+
+        keys = array('Q')
+        dates = array('I')
+        j = 0
+        for i in range(len(current_keys)):
+            key = current_keys[i]
+            while j < len(additions) and additions[j][0] < key:
+                keys.append(additions[j][0])
+                dates.append(additions[j][1])
+                j += 1
+            if key not in removed:
+                keys.append(key)
+                dates.append(self.dates[i])
+        for key, date in additions[j:]:
+            keys.append(key)
+            dates.append(date)
+        return DNCLRegistry(keys, dates)
+
+    def close(self):
+        """Release the memory map of an index opened with open()"""
+        if self.key_filter is not None:
+            self.key_filter.close()
+            self.key_filter = None
+        if self._mapping is None:
+            return
+        for view in (self.keys, self.dates, self.directory, self.blocks, self.block_offsets):
+            if isinstance(view, memoryview):
+                view.release()
+        self._mapping.close()
+        self._mapping = None
+        self.keys = array('Q')
+        self.dates = array('I')
+        self.directory = build_directory(self.keys)
+        self.blocks = self.block_offsets = None
+        self._decoded.clear()
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __contains__(self, phone: str) -> bool:
+        return self.lookup(phone)[0]
+
+    def _find(self, key: int) -> int:
+        """Position of key in the sorted key array, or -1"""
+        # No Bloom filter here: hashing one key in Python costs more than bisect's C search.
+        # The filter pays off in the vectorized lookup_many.
+        prefix = key // EXCHANGE_WIDTH
+        if prefix >= DIRECTORY_SIZE:
+            return -1
+        start, end = self.directory[prefix], self.directory[prefix + 1]
+        if start == end:
+            return -1  # No registrations in this exchange
+        if self.keys is None:
+            block = self._block(prefix)
+            i = bisect_left(block, key)
+            return start + i if i < len(block) and block[i] == key else -1
+        i = bisect_left(self.keys, key, start, end)
+        if i < end and self.keys[i] == key:
+            return i
+        return -1
+
+    def lookup(self, phone: str) -> Tuple[bool, Optional[str]]:
+        """Return (is_registered, registration_date) for a phone number"""
+        number = normalize_registry_number(phone)
+        if number is None:
+            return False, None
+        i = self._find(int(number))
+        if i < 0:
+            return False, None
+        return True, decode_registration_date(self.dates[i])
+
+    def lookup_many(self, phones: Iterable[str]) -> List[Tuple[bool, Optional[str]]]:
+        """Batch version of lookup, vectorized with searchsorted when NumPy is available"""
+        numbers = [normalize_registry_number(phone) for phone in phones]
+        query = [int(number) if number is not None else 0 for number in numbers]
+        results: List[Tuple[bool, Optional[str]]] = [(False, None)] * len(query)
+
+        if np is not None and len(self):
+            query_view = np.array(query, dtype=np.uint64)
+            # Numbers in an exchange with no registrations are settled by the directory alone
+            prefixes = np.minimum(query_view // np.uint64(EXCHANGE_WIDTH), np.uint64(DIRECTORY_SIZE - 1)).astype(np.int64)
+            directory = np.frombuffer(self.directory, dtype=np.uint32)
+            possible = directory[prefixes + 1] > directory[prefixes]
+            if self.key_filter is not None:
+                # Only numbers the filter can't rule out go on to the binary search
+                possible &= self.key_filter.might_contain_many(query_view)
+            candidates = np.flatnonzero(possible)
+            # Searching in key order walks the index block by block instead of jumping around it
+            candidates = candidates[np.argsort(query_view[candidates], kind='stable')]
+            if self.keys is None:
+                # Encoded index: each exchange block is decoded (or fetched from the cache) once
+                current_prefix, start, block = -1, 0, None
+                for i in candidates.tolist():
+                    key = query[i]
+                    if key // EXCHANGE_WIDTH != current_prefix:
+                        current_prefix = key // EXCHANGE_WIDTH
+                        start, block = self.directory[current_prefix], self._block(current_prefix)
+                    j = bisect_left(block, key)
+                    if j < len(block) and block[j] == key and numbers[i] is not None:
+                        results[i] = (True, decode_registration_date(self.dates[start + j]))
+                return results
+            key_view = np.frombuffer(self.keys, dtype=np.uint64)
+            positions = np.minimum(np.searchsorted(key_view, query_view[candidates]), len(key_view) - 1)
+            found = key_view[positions] == query_view[candidates]
+            for i, position in zip(candidates[found], positions[found]):
+                if numbers[i] is not None:
+                    results[i] = (True, decode_registration_date(self.dates[position]))
+            return results
+
+        for i, key in enumerate(query):
+            if numbers[i] is None:
+                continue
+            position = self._find(key)
+            if position >= 0:
+                results[i] = (True, decode_registration_date(self.dates[position]))
+        return results
+
+@contextmanager
+def index_lock(index_path: Union[str, Path]):
+    """
+    Exclusive lock on `<index>.lock` for a rebuild or delta merge, so workers starting on a
+    stale index build it once instead of all at the same time
+    """
+    index_path = Path(index_path)
+    with open(index_path.with_name(index_path.name + '.lock'), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after about 10 seconds; a build takes longer
+                    time.sleep(1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def build_registry_index(path: Union[str, Path], index_path: Union[str, Path]) -> DNCLRegistry:
+    """Parse the registry text files once and persist them as a memory-mappable index"""
+    DNCLRegistry.load(path).save(index_path)
+    return DNCLRegistry.open(index_path)
+
+def ingest_delta(delta_path: Union[str, Path], index_path: Union[str, Path],
+                 db_path: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Merge a subscription delta file into the persisted index, then re-mark only the rows of
+    the numbers table whose number changed. Returns (numbers_changed, rows_updated).
+    """
+    changes = read_delta(delta_path)
+    # Checked before the index is touched, and never by opening a DatabaseManager, which
+    # would leave an empty database behind
+    if db_path is not None and not numbers_table_exists(db_path):
+        print(f"No numbers table in {db_path}, skipping re-marking")
+        db_path = None
+
+    # Held across read-merge-write, so two merges running at once can't drop each other's changes
+    with index_lock(index_path):
+        registry = DNCLRegistry.open(index_path)
+        merged = registry.apply_delta(changes)
+        merged.snapshot_at = max(registry.snapshot_at or 0, Path(delta_path).stat().st_mtime)
+        registry.close()
+        merged.save(index_path)
+
+    rows_updated = 0
+    if db_path is not None:
+        rows_updated = DatabaseManager(db_path).apply_registry_changes(changes)
+    return len(changes), rows_updated
+
+def filter_summary(registry: DNCLRegistry) -> str:
+    """One line on the Bloom filter of an opened index: size and measured false-positive rate"""
+    if registry.key_filter is None:
+        return "No Bloom filter for this index"
+    # The encoded index file as mapped, or the raw columns of an in-memory index
+    index_bytes = len(registry._mapping) if registry._mapping is not None else len(registry) * 12
+    return (
+        f"Bloom filter: {registry.key_filter.memory_bytes / 1024 / 1024:.1f} MB "
+        f"({registry.key_filter.memory_bytes * 8 / max(len(registry), 1):.1f} bits/number, index "
+        f"{index_bytes / 1024 / 1024:.1f} MB), measured false-positive rate "
+        f"{measure_false_positive_rate(registry.key_filter, lambda key: registry._find(key) >= 0):.4%}"
+    )
+
+def index_is_stale(path: Union[str, Path], index_path: Union[str, Path]) -> bool:
+    """True when the index is missing or older than any of the registry text files"""
+    index_path = Path(index_path)
+    if not index_path.exists():
+        return True
+    index_mtime = index_path.stat().st_mtime
+    return any(p.stat().st_mtime > index_mtime for p in iter_registry_files(path))
+
+def load_registry(path: Optional[Union[str, Path]] = None,
+                  index_path: Optional[Union[str, Path]] = None) -> DNCLRegistry:
+    """
+    Open the registry index (DNCL_REGISTRY_INDEX), rebuilding it from the text files at
+    path (DNCL_REGISTRY_PATH) only when those are newer than the index.
+    """
+    if path is None:
+        path = os.getenv('DNCL_REGISTRY_PATH', '../registry')
+    if index_path is None:
+        index_path = os.getenv('DNCL_REGISTRY_INDEX', '../dncl_registry.idx')
+
+    if not Path(path).exists() and Path(index_path).exists():
+        return DNCLRegistry.open(index_path)  # Only the index was shipped to this host
+    if index_is_stale(path, index_path):
+        with index_lock(index_path):
+            # Another worker may have rebuilt the index while this one waited for the lock
+            if index_is_stale(path, index_path):
+                return build_registry_index(path, index_path)
+    return DNCLRegistry.open(index_path)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the local DNCL registry index")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Build the index from the registry area-code files")
+    build_parser.add_argument('source', nargs='?', default=os.getenv('DNCL_REGISTRY_PATH', '../registry'))
+    build_parser.add_argument('index', nargs='?', default=os.getenv('DNCL_REGISTRY_INDEX', '../dncl_registry.idx'))
+
+    ingest_parser = subparsers.add_parser('ingest', help="Merge an additions/deletions delta file into the index")
+    ingest_parser.add_argument('delta')
+    ingest_parser.add_argument('index', nargs='?', default=os.getenv('DNCL_REGISTRY_INDEX', '../dncl_registry.idx'))
+    ingest_parser.add_argument('--db', default='../numbers.db', help="numbers database to re-mark (use '' to skip)")
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        registry = build_registry_index(args.source, args.index)
+        print(f"Indexed {len(registry)} numbers from {args.source} into {args.index}")
+        print(filter_summary(registry))
+        registry.close()
+    elif args.command == 'ingest':
+        numbers_changed, rows_updated = ingest_delta(args.delta, args.index, args.db or None)
+        print(f"Merged {numbers_changed} changed numbers into {args.index}, re-marked {rows_updated} rows")
+        registry = DNCLRegistry.open(args.index)
+        print(filter_summary(registry))
+        registry.close()
@@ -0,0 +1,264 @@
+import csv
+import gzip
+import io
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from database_manager import DatabaseManager, numbers_table_exists
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, only needed for Parquet output
+    pa = None
+    ds = None
+    pq = None
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# Bookkeeping columns that mean nothing outside a running check
+INTERNAL_COLUMNS = {'dncl_claimed_by', 'dncl_lease_expires_at', 'dncl_change_seq'}
+
+# Always present in a partitioned snapshot, whatever source columns are chosen
+DNCL_RESULT_COLUMNS = ['dncl_status', 'dncl_registration_date', 'dncl_checked_at']
+
+# Partition key name -> SQL expression it is computed from
+PARTITION_EXPRESSIONS = {
+    'check_date': "substr(dncl_checked_at, 1, 10)",
+    'status': "dncl_status",
+}
+
+def detect_export_format(path: Union[str, Path]) -> str:
+    """'csv', 'csv.gz' or 'parquet' from the output file name"""
+    name = str(path).lower()
+    if name.endswith('.parquet'):
+        return 'parquet'
+    if name.endswith('.csv.gz') or name.endswith('.gz'):
+        return 'csv.gz'
+    return 'csv'
+
+def export_columns(conn, columns: Optional[Sequence[str]] = None) -> List[str]:
+    """Requested columns (validated against the table), or every non-internal column"""
+    available = [row[1] for row in conn.execute("PRAGMA table_info(numbers)").fetchall()]
+    if not columns:
+        return [column for column in available if column not in INTERNAL_COLUMNS]
+    by_lower = {column.lower(): column for column in available}
+    unknown = [column for column in columns if column.lower() not in by_lower]
+    if unknown:
+        raise ValueError(f"Unknown numbers columns: {', '.join(unknown)}")
+    return [by_lower[column.lower()] for column in columns]
+
+def build_export_query(columns: Sequence[str], statuses: Optional[Sequence[str]] = None,
+                       checked_after: Optional[str] = None,
+                       computed: Optional[Dict[str, str]] = None,
+                       changed_after: Optional[int] = None) -> Tuple[str, list]:
+    """
+    SELECT for the export with the status / checked-after filters applied;
+    computed maps extra output names to the SQL expressions that produce them,
+    changed_after keeps only rows whose result changed after that change sequence
+    """
+    conditions = []
+    params: list = []
+    if statuses:
+        conditions.append(f"dncl_status IN ({', '.join('?' for _ in statuses)})")
+        params.extend(status.upper() for status in statuses)
+    if checked_after:
+        conditions.append("dncl_checked_at >= ?")
+        params.append(checked_after)
+    if changed_after is not None:
+        conditions.append("dncl_change_seq > ?")
+        params.append(changed_after)
+
+    select_list = ', '.join('"' + column.replace('"', '""') + '"' for column in columns)
+    for name, expression in (computed or {}).items():
+        select_list += f', {expression} AS "{name}"'
+    sql = f"SELECT {select_list} FROM numbers"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if changed_after is not None:
+        # Walk idx_numbers_change_seq instead of scanning the table in id order
+        return sql + " ORDER BY dncl_change_seq", params
+    return sql + " ORDER BY id", params
+
+def iter_chunks(cursor, chunk_size: int) -> Iterator[List[tuple]]:
+    """Pull the result set a chunk at a time, so memory stays flat however many rows match"""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield [tuple(row) for row in rows]
+
+def write_csv(chunks: Iterator[List[tuple]], columns: Sequence[str], path: Union[str, Path],
+              compress: bool = False) -> int:
+    """Write chunks to a (gzip-)CSV file as they arrive; returns rows written"""
+    raw = gzip.open(path, 'wb') if compress else open(path, 'wb')
+    written = 0
+    with io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            written += len(chunk)
+    return written
+
+def parquet_schema(columns: Sequence[str]):
+    """id as int64, everything else as string (SQLite columns carry no reliable types)"""
+    return pa.schema([
+        pa.field(column, pa.int64() if column.lower() == 'id' else pa.string())
+        for column in columns
+    ])
+
+def chunk_to_arrow(chunk: List[tuple], schema):
+    """Column-major Arrow batch for one chunk of rows"""
+    arrays = []
+    for i, field in enumerate(schema):
+        values = [row[i] for row in chunk]
+        if not pa.types.is_integer(field.type):
+            values = [None if value is None else str(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def write_parquet(chunks: Iterator[List[tuple]], columns: Sequence[str], path: Union[str, Path]) -> int:
+    """Write each chunk as its own Parquet row group; returns rows written"""
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    schema = parquet_schema(columns)
+    written = 0
+    with pq.ParquetWriter(str(path), schema, compression='zstd') as writer:
+        for chunk in chunks:
+            writer.write_batch(chunk_to_arrow(chunk, schema))
+            written += len(chunk)
+    return written
+
+def write_parquet_dataset(chunks: Iterator[List[tuple]], columns: Sequence[str],
+                          output_dir: Union[str, Path], partition_by: str) -> int:
+    """
+    Write chunks as a hive-partitioned Parquet dataset (output_dir/<partition_by>=<value>/...).
+    The last column of every row is the partition value. The dataset is built beside
+    output_dir and swapped in at the end, so readers never see a half-written snapshot.
+    Returns rows written.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    schema = parquet_schema(list(columns) + [partition_by])
+    written = 0
+
+    def batches():
+        nonlocal written
+        for chunk in chunks:
+            written += len(chunk)
+            yield chunk_to_arrow(chunk, schema)
+
+    output_dir = Path(output_dir)
+    staging_dir = output_dir.with_name(output_dir.name + '.tmp')
+    if staging_dir.exists():
+        shutil.rmtree(staging_dir)
+    ds.write_dataset(
+        batches(),
+        staging_dir,
+        schema=schema,
+        format='parquet',
+        partitioning=[partition_by],
+        partitioning_flavor='hive',
+        file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+        existing_data_behavior='error'
+    )
+    if output_dir.exists():
+        retired_dir = output_dir.with_name(output_dir.name + '.old')
+        os.replace(output_dir, retired_dir)
+        os.replace(staging_dir, output_dir)
+        shutil.rmtree(retired_dir)
+    else:
+        os.replace(staging_dir, output_dir)
+    return written
+
+def export_results(output: Union[str, Path], db_path: str = "../numbers.db",
+                   export_format: Optional[str] = None, statuses: Optional[Sequence[str]] = None,
+                   checked_after: Optional[str] = None, columns: Optional[Sequence[str]] = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE, partition_by: Optional[str] = None,
+                   incremental: Optional[str] = None) -> int:
+    """
+    Stream matching rows of the numbers table to output; returns rows written.
+    With partition_by ('check_date' or 'status') output is a directory holding a
+    partitioned Parquet snapshot of the DNCL result columns plus the chosen columns.
+    With incremental (an export target name) only rows whose result changed since that
+    target's last export are written (everything on its first run), and the target's
+    watermark is advanced once the file is complete.
+    """
+    export_format = export_format or ('parquet' if partition_by else detect_export_format(output))
+    if export_format != 'parquet' and partition_by:
+        raise ValueError("Partitioned output is only available for Parquet")
+    if partition_by and incremental:
+        raise ValueError("Incremental exports write a single file, not a partitioned snapshot")
+    if partition_by and partition_by not in PARTITION_EXPRESSIONS:
+        raise ValueError(f"Can't partition by {partition_by}")
+    # DatabaseManager would create an empty file for a mistyped path and fail further down
+    if not numbers_table_exists(db_path):
+        raise FileNotFoundError(f"No numbers table in {db_path}")
+
+    db = DatabaseManager(db_path)
+    try:
+        changed_after = db.get_export_watermark(incremental) if incremental else None
+        with db.connection() as conn:
+            # One read transaction: the rows and the change sequence come from the same snapshot
+            conn.execute("BEGIN")
+            change_seq = db.current_change_seq(conn)
+            selected = export_columns(conn, columns)
+            computed = None
+            if partition_by:
+                selected = list(dict.fromkeys(selected + export_columns(conn, DNCL_RESULT_COLUMNS)))
+                computed = {partition_by: PARTITION_EXPRESSIONS[partition_by]}
+            sql, params = build_export_query(selected, statuses, checked_after, computed, changed_after)
+            chunks = iter_chunks(conn.execute(sql, params), chunk_size)
+
+            if partition_by:
+                written = write_parquet_dataset(chunks, selected, output, partition_by)
+            elif export_format == 'parquet':
+                written = write_parquet(chunks, selected, output)
+            else:
+                written = write_csv(chunks, selected, output, compress=export_format == 'csv.gz')
+            conn.commit()
+
+        if incremental:
+            db.set_export_watermark(incremental, change_seq)
+        return written
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export DNCL results from the numbers table")
+    parser.add_argument('output', help="Output file (.csv, .csv.gz, .parquet) or, with --partition-by, a directory")
+    parser.add_argument('--db', default='../numbers.db')
+    parser.add_argument('--format', choices=['csv', 'csv.gz', 'parquet'], default=None)
+    parser.add_argument('--status', action='append', help="Only rows with this dncl_status (repeatable)")
+    parser.add_argument('--checked-after', help="Only rows checked at or after this ISO date/time")
+    parser.add_argument('--columns', help="Comma-separated columns to export (default: all)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--partition-by', choices=sorted(PARTITION_EXPRESSIONS),
+                        help="Write a partitioned Parquet snapshot directory instead of a single file")
+    parser.add_argument('--incremental', nargs='?', const='default', metavar='TARGET',
+                        help="Only rows changed since the last incremental export to TARGET (default: 'default')")
+    args = parser.parse_args()
+
+    if not numbers_table_exists(args.db):
+        parser.error(f"No numbers table in {args.db}")
+
+    start_time = time.time()
+    written = export_results(
+        args.output,
+        db_path=args.db,
+        export_format=args.format,
+        statuses=args.status,
+        checked_after=args.checked_after,
+        columns=args.columns.split(',') if args.columns else None,
+        chunk_size=args.chunk_size,
+        partition_by=args.partition_by,
+        incremental=args.incremental
+    )
+    print(f"Exported {written} rows to {args.output} in {time.time() - start_time:.1f}s")
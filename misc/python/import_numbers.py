@@ -0,0 +1,202 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from database_manager import DatabaseManager
+
+DEFAULT_BATCH_SIZE = 50000
+
+# Columns the checker selects work by; an input without them can't be processed
+REQUIRED_COLUMNS = ('telephone', 'phone_type')
+
+def quote_identifier(name: str) -> str:
+    """Quote a column or table name taken from an input file"""
+    return '"' + name.replace('"', '""') + '"'
+
+def open_text(path: Union[str, Path]) -> io.TextIOBase:
+    """Open a (possibly gzipped) text file for streaming"""
+    path = Path(path)
+    if path.suffix.lower() == '.gz':
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', errors='replace', newline='')
+    return open(path, 'r', encoding='utf-8', errors='replace', newline='')
+
+def detect_format(path: Union[str, Path]) -> str:
+    """'csv' or 'jsonl' from the file name (ignoring a trailing .gz)"""
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes if suffix.lower() != '.gz']
+    extension = suffixes[-1] if suffixes else ''
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    if extension in ('.csv', '.tsv', '.txt'):
+        return 'csv'
+    raise ValueError(f"Can't tell the format of {path}, pass --format csv or --format jsonl")
+
+def iter_csv_records(f: io.TextIOBase) -> Iterator[Dict[str, Optional[str]]]:
+    """Stream CSV rows as dicts (delimiter taken from the header line), empty fields as None"""
+    csv.field_size_limit(sys.maxsize)
+    header = f.readline()
+    if not header:
+        return
+    delimiter = max(',;\t|', key=header.count)
+    reader = csv.DictReader(itertools.chain([header], f), delimiter=delimiter)
+    for row in reader:
+        yield {key: (value if value != '' else None) for key, value in row.items() if key is not None}
+
+def iter_jsonl_records(f: io.TextIOBase) -> Iterator[Dict]:
+    """Stream JSON Lines records (one object per line)"""
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number} is not valid JSON: {e}") from e
+        if isinstance(record, dict):
+            yield record
+
+def _to_sql_value(value):
+    """Keep scalars as-is; nested JSON values are stored as JSON text"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if value == '':
+        return None
+    return value
+
+class NumbersImporter:
+    """Streams records into the numbers table in large executemany transactions"""
+
+    def __init__(self, db_path: str = "../numbers.db", table: str = 'numbers',
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db_path = db_path
+        self.table = table
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(db_path)
+        # Bulk-load settings: a crash mid-import means re-running the import, not corruption
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("PRAGMA cache_size = -262144")  # 256 MB
+        self.columns: List[str] = self._existing_columns()
+        self.rejected = 0  # Records whose id isn't an integer (usually a broken line in the source)
+
+    def _existing_columns(self) -> List[str]:
+        cursor = self.conn.execute(f"PRAGMA table_info({quote_identifier(self.table)})")
+        return [row[1] for row in cursor.fetchall()]
+
+    def _ensure_columns(self, names: Iterable[str]):
+        """Create the table on first use, add any column the input has and the table lacks"""
+        known = {column.lower() for column in self.columns}
+        missing = [name for name in dict.fromkeys(names) if name.lower() not in known]
+        if not missing:
+            return
+
+        if not self.columns:
+            definitions = [
+                f"{quote_identifier(name)} INTEGER PRIMARY KEY" if name.lower() == 'id'
+                else f"{quote_identifier(name)} TEXT"
+                for name in missing
+            ]
+            if 'id' not in {name.lower() for name in missing}:
+                definitions.insert(0, "id INTEGER PRIMARY KEY")
+            self.conn.execute(f"CREATE TABLE {quote_identifier(self.table)} ({', '.join(definitions)})")
+        else:
+            for name in missing:
+                self.conn.execute(f"ALTER TABLE {quote_identifier(self.table)} ADD COLUMN {quote_identifier(name)} TEXT")
+        self.columns = self._existing_columns()
+
+    def _check_required_columns(self, names: Iterable[str]):
+        """Refuse an input that, with the table's existing columns, lacks a REQUIRED_COLUMNS field"""
+        known = {column.lower() for column in self.columns} | {name.lower() for name in names}
+        missing = [column for column in REQUIRED_COLUMNS if column not in known]
+        if missing:
+            raise ValueError(
+                f"The input has no {', '.join(missing)} field (fields: {', '.join(names)}); "
+                f"the {self.table} table needs {', '.join(REQUIRED_COLUMNS)}"
+            )
+
+    def _insert_batch(self, batch: List[Dict]) -> int:
+        """Insert one batch in a single transaction; rows whose id already exists are kept"""
+        names = list(dict.fromkeys(name for record in batch for name in record))
+        # Checked before anything is written, so a wrong file leaves the database untouched
+        self._check_required_columns(names)
+        self._ensure_columns(names)
+        placeholders = ', '.join('?' for _ in names)
+        statement = (
+            f"INSERT OR IGNORE INTO {quote_identifier(self.table)} "
+            f"({', '.join(quote_identifier(name) for name in names)}) VALUES ({placeholders})"
+        )
+        with self.conn:
+            cursor = self.conn.executemany(
+                statement,
+                ([_to_sql_value(record.get(name)) for name in names] for record in batch)
+            )
+        return cursor.rowcount
+
+    def import_records(self, records: Iterable[Dict], progress_every: int = 500000) -> int:
+        """Insert records batch by batch with constant memory; returns the number inserted"""
+        inserted = 0
+        read = 0
+        start_time = time.time()
+        batch: List[Dict] = []
+        for record in records:
+            read += 1
+            record_id = record.get('id')
+            if record_id is not None and not str(record_id).strip().lstrip('-').isdigit():
+                self.rejected += 1
+                continue
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                inserted += self._insert_batch(batch)
+                batch = []
+            if progress_every and read % progress_every == 0:
+                print(f"Read {read} records ({read / max(time.time() - start_time, 1e-9):.0f}/s)")
+        if batch:
+            inserted += self._insert_batch(batch)
+        return inserted
+
+    def import_file(self, path: Union[str, Path], file_format: Optional[str] = None) -> int:
+        """Stream a CSV or JSON Lines file (optionally .gz) into the table"""
+        file_format = file_format or detect_format(path)
+        with open_text(path) as f:
+            records = iter_csv_records(f) if file_format == 'csv' else iter_jsonl_records(f)
+            return self.import_records(records)
+
+    def close(self):
+        self.conn.close()
+
+def import_numbers(path: Union[str, Path], db_path: str = "../numbers.db",
+                   file_format: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Import a lead file into the numbers table, then let DatabaseManager add the DNCL
+    columns, indexes and progress counters once, after all rows are in.
+    Returns (rows_inserted, records_rejected).
+    """
+    importer = NumbersImporter(db_path, batch_size=batch_size)
+    try:
+        inserted = importer.import_file(path, file_format)
+    finally:
+        importer.close()
+    DatabaseManager(db_path).close()
+    return inserted, importer.rejected
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream a CSV or JSON Lines lead file into the numbers table")
+    parser.add_argument('path', help="CSV/TSV or JSON Lines file, optionally gzipped")
+    parser.add_argument('--db', default='../numbers.db')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default=None)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    inserted, rejected = import_numbers(args.path, args.db, args.format, args.batch_size)
+    print(f"Imported {inserted} rows into {args.db} in {time.time() - start_time:.1f}s")
+    if rejected:
+        print(f"Skipped {rejected} records with a non-numeric id")
@@ -4,14 +4,15 @@ from pathlib import Path
 from extract_captcha_tokens_with_audio import CaptchaTokenExtractor as AudioCaptchaTokenExtractor
 from extract_captcha_tokens_with_ai import CaptchaTokenExtractor as VisualCaptchaTokenExtractor
 from extract_captcha_tokens_with_2captcha import CaptchaTokenExtractor as TwoCaptchaTokenExtractor
-from send_dncl_request import send_dncl_request, TokenExpiredError
-from typing import List, Optional, Dict
+from send_dncl_request import send_dncl_request, lookup_dncl_registry_batch, precheck_phone_number, TokenExpiredError
+from dncl_registry import load_registry
+from database_manager import DatabaseManager, default_worker_id
 import asyncio
 import sqlite3
-from datetime import datetime
 from colorama import init, Fore, Style, Back
 import time
 import threading
+import progress_server
 from progress_server import run_server
 
 # Load the .env file from parent directory
@@ -19,136 +20,17 @@ load_dotenv('../.env')
 
 # Add this constant at the top of the file after imports
 BYPASSING_METHOD = '2captcha'  # can be 'audio', 'visual', or '2captcha'
-
-class DatabaseManager:
-    def __init__(self, db_path: str = "../numbers.db"):
-        # Use relative path to access database in parent directory
-        self.db_path = db_path
-        self.setup_database()
-    
-    def setup_database(self):
-        """Add DNCL-related columns if they don't exist"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Add new columns if they don't exist
-        try:
-            cursor.execute("""
-                ALTER TABLE numbers 
-                ADD COLUMN dncl_status TEXT
-            """)
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-            
-        try:
-            cursor.execute("""
-                ALTER TABLE numbers 
-                ADD COLUMN dncl_registration_date TEXT
-            """)
-        except sqlite3.OperationalError:
-            pass
-            
-        try:
-            cursor.execute("""
-                ALTER TABLE numbers 
-                ADD COLUMN dncl_checked_at TEXT
-            """)
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-            
-        conn.commit()
-        conn.close()
-    
-    def get_next_engineer(self) -> Optional[Dict]:
-        """Get next engineer with null DNCL status and mobile phone"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE numbers 
-            SET dncl_status = 'PROCESSING'
-            WHERE id = (
-                SELECT id 
-                FROM numbers 
-                WHERE (dncl_status IS NULL OR dncl_status = '')
-                AND telephone IS NOT NULL 
-                AND phone_type = 'MOBILE'
-                LIMIT 1
-            )
-            RETURNING id, telephone, nom, prenom
-        """)
-        
-        row = cursor.fetchone()
-        conn.commit()
-        conn.close()
-        
-        if row:
-            return dict(row)
-        return None
-    
-    def get_unprocessed_count(self) -> int:
-        """Get count of remaining unprocessed numbers"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT COUNT(*) as count 
-            FROM numbers 
-            WHERE (dncl_status IS NULL OR dncl_status = '')
-            AND telephone IS NOT NULL 
-            AND phone_type = 'MOBILE'
-        """)
-        
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
-    
-    def update_engineer_dncl_status(self, engineer_id: int, dncl_result: Dict):
-        """Update engineer's DNCL status based on API response"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if dncl_result.get('status') == 'INVALID':
-            status = 'INVALID'
-            registration_date = None
-        elif dncl_result.get('status') == 'ERROR':
-            status = 'ERROR'
-            registration_date = None
-        else:
-            status = 'ACTIVE' if dncl_result.get('Active', False) else 'INACTIVE'
-            registration_date = dncl_result.get('AddedAt')
-        
-        current_time = datetime.now().isoformat()
-        
-        cursor.execute("""
-            UPDATE numbers 
-            SET dncl_status = ?,
-                dncl_registration_date = ?,
-                dncl_checked_at = ?
-            WHERE id = ?
-        """, (status, registration_date, current_time, engineer_id))
-        
-        conn.commit()
-        conn.close()
-    
-    def reset_engineer_status(self, engineer_id: int):
-        """Reset an engineer's DNCL status back to null"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE numbers 
-            SET dncl_status = NULL
-            WHERE id = ?
-        """, (engineer_id,))
-        
-        conn.commit()
-        conn.close()
+# Where DNCL answers come from: 'api' (captcha token + public endpoint) or 'registry'
+# (local copy of the subscription area-code files found at DNCL_REGISTRY_PATH)
+CHECK_METHOD = 'api'
+REGISTRY_BATCH_SIZE = 1000  # Numbers looked up and written back per transaction in registry mode
 
 class TokenEventManager:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        # Claims, result writes and resets all carry this id, so a row reclaimed after its
+        # lease ran out is never overwritten or reset by this process
+        self.worker_id = default_worker_id()
         self.start_time = time.time()
         self.processed_count = 0
         self.total_initial_count = self.db.get_unprocessed_count()
@@ -189,13 +71,33 @@ class TokenEventManager:
         print(f"{Fore.CYAN}Avg Time Per Number: {Fore.YELLOW}{avg_time_per_request:.1f}s")
         print(f"{Fore.CYAN}Estimated Time Remaining: {Fore.YELLOW}{time_remaining}{Style.RESET_ALL}\n")
     
+    def print_lost_claim(self, phone: str):
+        """A result that wasn't written because this worker no longer holds the row's claim"""
+        print(f"{Fore.YELLOW}⚠️ {phone}: claim lost to another worker, result not written{Style.RESET_ALL}")
+
     async def on_token_found(self, token: str):
         """Called whenever a new token is found"""
         print(f"\n{Back.GREEN}{Fore.BLACK} NEW TOKEN RECEIVED {Style.RESET_ALL}")
         print(f"{Fore.CYAN}Token: {Fore.YELLOW}{token[:50]}...{Style.RESET_ALL}\n")
         
-        # Get next engineer to check
-        engineer = self.db.get_next_engineer()
+        # Get next engineer to check, settling rows whose number is invalid locally or already
+        # has a fresh result in the cache so the token is spent on a number that needs it
+        engineer = self.db.get_next_engineer(self.worker_id)
+        while engineer:
+            local_result = precheck_phone_number(engineer['telephone'])
+            if local_result is None:
+                local_result = self.db.get_cached_result(engineer['telephone'])
+            if local_result is None:
+                break
+            if self.db.update_engineer_dncl_status(engineer['id'], local_result, self.worker_id):
+                self.processed_count += 1
+                status = local_result.get('status') or ('ACTIVE' if local_result['Active'] else 'INACTIVE')
+                source = 'cached' if local_result.get('cached') else local_result.get('error')
+                print(f"{Fore.CYAN}♻️ {engineer['telephone']}: {status} ({source}){Style.RESET_ALL}")
+            else:
+                self.print_lost_claim(engineer['telephone'])
+            engineer = self.db.get_next_engineer(self.worker_id)
+
         if not engineer:
             print(f"{Fore.YELLOW}⚠️ No more numbers to check!{Style.RESET_ALL}")
             return
@@ -207,8 +109,11 @@ class TokenEventManager:
         try:
             result = await send_dncl_request(phone, token)
             
-            # Update engineer record
-            self.db.update_engineer_dncl_status(engineer['id'], result)
+            # Update engineer record; nothing is written if the lease ran out and another
+            # worker has claimed the row since
+            if not self.db.update_engineer_dncl_status(engineer['id'], result, self.worker_id):
+                self.print_lost_claim(phone)
+                return
             
             # Update progress
             self.processed_count += 1
@@ -229,15 +134,57 @@ class TokenEventManager:
             
         except TokenExpiredError:
             # Token has expired, mark the current number back as unprocessed
-            self.db.reset_engineer_status(engineer['id'])
+            self.db.reset_engineer_status(engineer['id'], self.worker_id)
             print(f"{Fore.YELLOW}⚠️ Token expired, requesting new token...{Style.RESET_ALL}")
             return  # Exit to get new token
                 
         except Exception as e:
             # If there's an error, mark the engineer as ERROR so we can retry later
-            self.db.update_engineer_dncl_status(engineer['id'], {'status': 'ERROR', 'error': str(e)})
+            self.db.update_engineer_dncl_status(engineer['id'], {'status': 'ERROR', 'error': str(e)}, self.worker_id)
             print(f"{Fore.RED}❌ {phone}: {str(e)}{Style.RESET_ALL}")
 
+def plan_run(db: DatabaseManager):
+    """Pre-run planning: reject malformed numbers, answer what the cache already knows and fold duplicate numbers"""
+    normalized, invalid = db.normalize_numbers()
+    print(f"{Fore.CYAN}Numbers normalized: {Fore.YELLOW}{normalized}{Fore.CYAN}, marked invalid locally: {Fore.YELLOW}{invalid}{Style.RESET_ALL}")
+    filled = db.fill_from_cache()
+    parked = db.plan_duplicates()
+    print(f"{Fore.CYAN}Filled from result cache: {Fore.YELLOW}{filled}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}Duplicate rows waiting on another row's check: {Fore.YELLOW}{parked}{Style.RESET_ALL}\n")
+
+def run_registry_check(db: DatabaseManager):
+    """Check every pending number against the local DNCL registry, no tokens or HTTP calls needed"""
+    registry_path = os.getenv('DNCL_REGISTRY_PATH', '../registry')
+    print(f"{Fore.CYAN}Loading DNCL registry from {Fore.YELLOW}{registry_path}{Style.RESET_ALL}")
+    load_start = time.time()
+    registry = load_registry(registry_path)
+    print(f"{Fore.CYAN}Registry numbers loaded: {Fore.YELLOW}{len(registry)}{Fore.CYAN} in {time.time() - load_start:.1f}s{Style.RESET_ALL}\n")
+
+    plan_run(db)
+    start_time = time.time()
+    counts = {'ACTIVE': 0, 'INACTIVE': 0, 'INVALID': 0}
+    worker_id = default_worker_id()
+
+    while True:
+        engineers = db.claim_batch(REGISTRY_BATCH_SIZE, worker_id)
+        if not engineers:
+            break
+
+        results = lookup_dncl_registry_batch([engineer['telephone'] for engineer in engineers], registry)
+        db.bulk_update_dncl_status(zip([engineer['id'] for engineer in engineers], results), worker_id)
+
+        for result in results:
+            if result.get('status') == 'INVALID':
+                counts['INVALID'] += 1
+            elif result.get('Active'):
+                counts['ACTIVE'] += 1
+            else:
+                counts['INACTIVE'] += 1
+
+    print(f"\n{Back.GREEN}{Fore.BLACK} REGISTRY CHECK COMPLETE {Style.RESET_ALL}")
+    print(f"{Fore.CYAN}Numbers checked: {Fore.YELLOW}{sum(counts.values())}{Fore.CYAN} in {time.time() - start_time:.1f}s")
+    print(f"{Fore.CYAN}Active: {Fore.YELLOW}{counts['ACTIVE']}{Fore.CYAN}, Inactive: {Fore.YELLOW}{counts['INACTIVE']}{Fore.CYAN}, Invalid: {Fore.YELLOW}{counts['INVALID']}{Style.RESET_ALL}\n")
+
 def start_progress_server():
     """Start the Flask progress server in a separate thread"""
     server_thread = threading.Thread(target=run_server)
@@ -275,15 +222,35 @@ async def main():
         print(f"{Back.RED}{Fore.WHITE} Database connection error: {str(e)} {Style.RESET_ALL}")
         return
 
+    # One pooled manager for the whole run: planning, every extraction cycle and the
+    # progress server thread
+    db = DatabaseManager(str(db_path))
+
+    # Offline mode: answer everything from the local registry and stop
+    if CHECK_METHOD == 'registry':
+        try:
+            run_registry_check(db)
+        except FileNotFoundError as e:
+            print(f"{Back.RED}{Fore.WHITE} Error: {str(e)} {Style.RESET_ALL}")
+            print("Set DNCL_REGISTRY_PATH to the downloaded area-code files.")
+        finally:
+            db.close()
+        return
+
     # Test .env required variables
     required_env_vars = ['2CAPTCHA_API_KEY']  # Add any other required env variables here
     missing_vars = [var for var in required_env_vars if not os.getenv(var)]
     if missing_vars:
         print(f"{Back.RED}{Fore.WHITE} Error: Missing required environment variables: {', '.join(missing_vars)} {Style.RESET_ALL}")
         print("Please check your .env file contains all required variables.")
+        db.close()
         return
 
+    # Look each distinct number up only once
+    plan_run(db)
+
     # Start the Flask progress server in a separate thread
+    progress_server._db = db
     start_progress_server()
     # await asyncio.sleep(200)  # Just a tiny delay to prevent system overload
 
@@ -291,7 +258,7 @@ async def main():
     while True:  # Main infinite loop
         try:
             # Create our event manager
-            event_manager = TokenEventManager()
+            event_manager = TokenEventManager(db)
             
             # Updated extractor selection logic
             if BYPASSING_METHOD == 'audio':
@@ -0,0 +1,118 @@
+"""
+Local stand-in for the DNCL public API (POST /v1/Consumer/Check), answering with the
+response shapes send_dncl_request handles. Point the checker at it with
+DNCL_API_URL=http://127.0.0.1:5050/v1/Consumer/Check to exercise the queue, database
+and result-writing layers without a captcha token or the real service.
+"""
+import hashlib
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+from flask import Flask, jsonify, request
+from phone_numbers import NON_DIGITS_PATTERN, is_canadian_number
+
+app = Flask(__name__)
+
+# Tunable from the command line (see the __main__ block) or by editing before app.run
+settings = {
+    'latency': 0.0,            # Mean seconds added to every response
+    'jitter': 0.0,             # +/- seconds of uniform noise around latency
+    'registered_rate': 0.3,    # Share of valid numbers reported as registered (200 Active)
+    'error_rate': 0.0,         # Share of requests answered with a 500
+    'token_error_rate': 0.0,   # Share of requests answered with the Authorization-Captcha 400
+}
+
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+REGISTRATION_EPOCH = datetime(2008, 9, 30)  # The National DNCL opened on this date
+
+def _number_hash(number: str) -> int:
+    """Stable per-number value, so the same number gets the same answer on every run"""
+    return int.from_bytes(hashlib.blake2b(number.encode(), digest_size=8).digest(), 'big')
+
+def registration_for(number: str) -> Tuple[bool, str]:
+    """(is_registered, AddedAt) the mock reports for a 10-digit number"""
+    value = _number_hash(number)
+    is_registered = (value % 10000) < settings['registered_rate'] * 10000
+    days = (value >> 16) % ((datetime(2024, 1, 1) - REGISTRATION_EPOCH).days)
+    added_at = (REGISTRATION_EPOCH + timedelta(days=days)).strftime('%Y-%m-%dT%H:%M:%S')
+    return is_registered, added_at
+
+def _model_state_error(key: str, message: str):
+    """400 body in the ASP.NET ModelState shape the real API uses"""
+    return jsonify({'Message': 'The request is invalid.', 'ModelState': {key: [message]}}), 400
+
+def _count(outcome: str):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+@app.route('/v1/Consumer/Check', methods=['POST'])
+def consumer_check():
+    delay = settings['latency'] + random.uniform(-settings['jitter'], settings['jitter'])
+    if delay > 0:
+        time.sleep(delay)
+
+    # Any non-empty token is accepted; token_error_rate simulates expired ones
+    token = request.headers.get('Authorization-Captcha', '')
+    if not token or random.random() < settings['token_error_rate']:
+        _count('token_error')
+        return _model_state_error('Authorization-Captcha', 'The captcha token is invalid or has expired.')
+
+    if random.random() < settings['error_rate']:
+        _count('server_error')
+        return jsonify({'Message': 'An error has occurred.'}), 500
+
+    payload = request.get_json(silent=True) or {}
+    digits = NON_DIGITS_PATTERN.sub('', str(payload.get('Phone', '')))
+    if len(digits) != 10:
+        _count('bad_request')
+        return _model_state_error('model.Phone', 'The Phone field is not a valid phone number.')
+    if not is_canadian_number(digits):
+        _count('invalid_area_code')
+        return _model_state_error('model.Phone', 'The area code is invalid.')
+
+    is_registered, added_at = registration_for(digits)
+    if not is_registered:
+        _count('not_found')
+        return jsonify({'Message': 'No registration found.'}), 404
+
+    _count('registered')
+    return jsonify({'Phone': digits, 'Active': True, 'AddedAt': added_at})
+
+@app.route('/stats')
+def stats():
+    """Responses served so far, by outcome"""
+    with _stats_lock:
+        counts: Dict[str, int] = dict(_stats)
+    return jsonify({'settings': settings, 'responses': counts, 'total': sum(counts.values())})
+
+def run_server(host: str = '127.0.0.1', port: int = 5050):
+    app.run(host=host, port=port, threaded=True)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local mock of the DNCL /v1/Consumer/Check endpoint")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--latency', type=float, default=settings['latency'], help="Mean response delay in seconds")
+    parser.add_argument('--jitter', type=float, default=settings['jitter'], help="Uniform +/- noise on the delay")
+    parser.add_argument('--registered-rate', type=float, default=settings['registered_rate'])
+    parser.add_argument('--error-rate', type=float, default=settings['error_rate'], help="Share of 500 responses")
+    parser.add_argument('--token-error-rate', type=float, default=settings['token_error_rate'],
+                        help="Share of Authorization-Captcha (expired token) responses")
+    args = parser.parse_args()
+
+    settings.update(
+        latency=args.latency,
+        jitter=args.jitter,
+        registered_rate=args.registered_rate,
+        error_rate=args.error_rate,
+        token_error_rate=args.token_error_rate
+    )
+    run_server(args.host, args.port)
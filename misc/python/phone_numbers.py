@@ -0,0 +1,104 @@
+import os
+import re
+import time
+from pathlib import Path
+from typing import FrozenSet, Iterable, List, Optional, Tuple, Union
+
+# Local table of Canadian area codes; replace the file (or point DNCL_AREA_CODES_PATH at a
+# newer copy) when new overlays come into service and running processes pick it up
+DEFAULT_AREA_CODES_PATH = Path(__file__).parent / 'canadian_area_codes.csv'
+
+# How often (seconds) canadian_area_codes() looks for a replaced area-code file
+AREA_CODES_CHECK_SECONDS = 5.0
+
+def load_area_codes(path: Optional[Union[str, Path]] = None) -> FrozenSet[str]:
+    """Read the NPA column of an area-code file (`npa[,region]` lines, header optional)"""
+    if path is None:
+        path = area_codes_path()
+    area_codes = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            npa = line.split(',', 1)[0].strip()
+            if len(npa) == 3 and npa.isdigit():
+                area_codes.add(npa)
+    return frozenset(area_codes)
+
+def area_codes_path() -> Path:
+    """DNCL_AREA_CODES_PATH, read at call time so a value from .env is seen once dotenv has loaded"""
+    return Path(os.getenv('DNCL_AREA_CODES_PATH') or DEFAULT_AREA_CODES_PATH)
+
+# Loaded on first use rather than at import: entry points import this module before load_dotenv
+_area_codes: FrozenSet[str] = frozenset()
+_area_codes_source: Optional[Tuple[str, float]] = None  # (path, mtime) _area_codes was read from
+_next_area_codes_check = 0.0
+
+def canadian_area_codes() -> FrozenSet[str]:
+    """
+    The Canadian area-code table, reloaded whenever the file is replaced or
+    DNCL_AREA_CODES_PATH changes (looked at every few seconds)
+    """
+    global _area_codes, _area_codes_source, _next_area_codes_check
+    now = time.monotonic()
+    if now >= _next_area_codes_check:
+        _next_area_codes_check = now + AREA_CODES_CHECK_SECONDS
+        path = area_codes_path()
+        source = (str(path), path.stat().st_mtime)
+        if source != _area_codes_source:
+            _area_codes = load_area_codes(path)
+            _area_codes_source = source
+    return _area_codes
+
+# Trailing extension: "x123", "ext. 123", "poste 123", "#123"
+EXTENSION_PATTERN = re.compile(r'\s*(?:#|x|ext\.?|extension|poste|p\.)\s*\d+\s*$', re.IGNORECASE)
+# Separators between several numbers packed into one field: keep the first one (only when
+# both sides hold a complete number, "514/555-1234" is a single number)
+MULTIPLE_NUMBERS_PATTERN = re.compile(r'\s*(?:/|;|,|\bor\b|\bou\b)\s*', re.IGNORECASE)
+# A complete number at the start of the field, followed by something else (bare extension digits)
+LEADING_NUMBER_PATTERN = re.compile(r'^\D*(?:1[\s.-]*)?(\(?\d{3}\)?[\s.-]*\d{3}[\s.-]*\d{4})(?!\d)')
+NON_DIGITS_PATTERN = re.compile(r'\D')
+# NANP: NPA and NXX start with 2-9, NPA's middle digit isn't 9, neither is an N11 service code
+NANP_PATTERN = re.compile(r'^(?!\d11)[2-9][0-8]\d(?!\d11)[2-9]\d{2}\d{4}$')
+
+def first_of_several_numbers(value: str) -> str:
+    """The part before the first separator that has a complete number on each side, or the whole value"""
+    for match in MULTIPLE_NUMBERS_PATTERN.finditer(value):
+        before, after = value[:match.start()], value[match.end():]
+        if len(NON_DIGITS_PATTERN.sub('', before)) >= 10 and len(NON_DIGITS_PATTERN.sub('', after)) >= 10:
+            return before
+    return value
+
+def normalize_phone_number(raw: Optional[str]) -> Optional[str]:
+    """
+    Reduce any common way of writing a NANP number ("(514) 555-1234", "+1 514 555 1234",
+    "514.555.1234 ext 22", ...) to its 10 digits, or None if it isn't a valid NANP number.
+    """
+    if not raw:
+        return None
+    value = first_of_several_numbers(str(raw).strip())
+    value = EXTENSION_PATTERN.sub('', value)
+    digits = NON_DIGITS_PATTERN.sub('', value)
+    if len(digits) == 11 and digits[0] == '1':
+        digits = digits[1:]
+    if len(digits) > 10:
+        # "514-429-4392 31": keep the leading number, drop the unmarked extension
+        match = LEADING_NUMBER_PATTERN.match(value)
+        if match:
+            digits = NON_DIGITS_PATTERN.sub('', match.group(1))
+    if not NANP_PATTERN.match(digits):
+        return None
+    return digits
+
+def is_canadian_number(number: str) -> bool:
+    """True if a normalized 10-digit number has a Canadian area code"""
+    return number[:3] in canadian_area_codes()
+
+def normalize_phone_column(values: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """
+    Validate a whole column at once: the normalized number for every value that is a valid
+    Canadian number, None for everything a DNCL check would reject.
+    """
+    normalized = []
+    for value in values:
+        number = normalize_phone_number(value)
+        normalized.append(number if number is not None and is_canadian_number(number) else None)
+    return normalized
@@ -1,10 +1,24 @@
 from flask import Flask, render_template_string, request
-import sqlite3
 from math import ceil
+from typing import Optional, Tuple
+from database_manager import RESULT_STATUSES, DatabaseManager
 
 app = Flask(__name__)
 app.jinja_env.globals.update(max=max, min=min)
 
+DB_PATH = '../numbers.db'
+_db: Optional[DatabaseManager] = None
+
+def get_db() -> DatabaseManager:
+    """
+    Shared DatabaseManager: main.py hands over its own; run standalone, one is created on the
+    first page hit so importing this module never touches the file
+    """
+    global _db
+    if _db is None:
+        _db = DatabaseManager(DB_PATH)
+    return _db
+
 # HTML template with Bootstrap styling
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -75,21 +89,22 @@ HTML_TEMPLATE = '''
         <div class="pagination-container">
             <nav>
                 <ul class="pagination">
-                    {% if page > 1 %}
+                    {% if prev_cursor %}
+                    <li class="page-item">
+                        <a class="page-link" href="?">First</a>
+                    </li>
                     <li class="page-item">
-                        <a class="page-link" href="?page={{ page - 1 }}">Previous</a>
+                        <a class="page-link" href="?before={{ prev_cursor|urlencode }}&page={{ page - 1 }}">Previous</a>
                     </li>
                     {% endif %}
                     
-                    {% for p in range(max(1, page - 2), min(total_pages + 1, page + 3)) %}
-                    <li class="page-item {{ 'active' if p == page else '' }}">
-                        <a class="page-link" href="?page={{ p }}">{{ p }}</a>
+                    <li class="page-item active">
+                        <span class="page-link">Page {{ page }} of {{ max(total_pages, 1) }}</span>
                     </li>
-                    {% endfor %}
                     
-                    {% if page < total_pages %}
+                    {% if next_cursor %}
                     <li class="page-item">
-                        <a class="page-link" href="?page={{ page + 1 }}">Next</a>
+                        <a class="page-link" href="?after={{ next_cursor|urlencode }}&page={{ page + 1 }}">Next</a>
                     </li>
                     {% endif %}
                 </ul>
@@ -100,62 +115,94 @@ HTML_TEMPLATE = '''
 </html>
 '''
 
+def encode_cursor(row) -> str:
+    """Keyset cursor for a results row: its (dncl_checked_at, id) sort key"""
+    return f"{row['dncl_checked_at']}|{row['id']}"
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Parse a cursor from the URL, None if absent or malformed"""
+    if not cursor:
+        return None
+    checked_at, _, row_id = cursor.rpartition('|')
+    try:
+        return checked_at, int(row_id)
+    except ValueError:
+        return None
+
 @app.route('/')
 def index():
-    # Get page number from query parameters
-    page = int(request.args.get('page', 1))
+    # Keyset paging: ?after=<cursor> pages to older results, ?before=<cursor> to newer ones.
+    # page is only carried along for the "Page x of y" label.
+    after = decode_cursor(request.args.get('after'))
+    before = decode_cursor(request.args.get('before'))
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+    except ValueError:
+        page = 1
     per_page = 50  # Number of records per page
     
-    # Connect to database
-    conn = sqlite3.connect('../numbers.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Get total count and processed count for progress calculation
-    cursor.execute('''
-        SELECT 
-            COUNT(*) as total,
-            COUNT(CASE WHEN dncl_status IS NOT NULL THEN 1 END) as processed
-        FROM numbers
-        WHERE telephone IS NOT NULL 
-        AND phone_type = 'MOBILE'
-    ''')
-    counts = cursor.fetchone()
-    total_count = counts['total']
-    processed_count = counts['processed']
-    
+    # Progress numbers come from the trigger-maintained dncl_progress counters, not COUNT(*)
+    progress_counts = get_db().get_progress_counts()
+    total_count = sum(counts['mobile'] for counts in progress_counts.values())
+    # Only rows with an answer: claimed rows and parked duplicates are still waiting on one
+    processed_count = sum(progress_counts.get(status, {}).get('mobile', 0) for status in RESULT_STATUSES)
+
     # Calculate progress percentage
     progress_percentage = (processed_count / total_count * 100) if total_count > 0 else 0
-    
+
     # Get total count for pagination
-    cursor.execute('SELECT COUNT(*) FROM numbers WHERE dncl_checked_at IS NOT NULL')
-    total_records = cursor.fetchone()[0]
+    total_records = sum(counts['checked'] for counts in progress_counts.values())
     total_pages = ceil(total_records / per_page)
+
+    if before is not None:
+        # Walk forward from the cursor, then flip back to newest-first
+        key_filter, order, params = 'AND (dncl_checked_at, id) > (?, ?)', 'ASC', before
+    elif after is not None:
+        key_filter, order, params = 'AND (dncl_checked_at, id) < (?, ?)', 'DESC', after
+    else:
+        key_filter, order, params = '', 'DESC', ()
     
-    # Get paginated results
-    offset = (page - 1) * per_page
-    cursor.execute('''
-        SELECT 
-            nom, 
-            prenom, 
-            telephone, 
-            LOWER(dncl_status) as dncl_status, 
-            dncl_registration_date, 
-            dncl_checked_at
-        FROM numbers 
-        WHERE dncl_checked_at IS NOT NULL
-        ORDER BY dncl_checked_at DESC
-        LIMIT ? OFFSET ?
-    ''', (per_page, offset))
+    # Borrow a pooled connection (WAL mode, so reads don't wait on the processing loop)
+    with get_db().connection() as conn:
+        cursor = conn.cursor()
+        
+        # One extra row tells whether there is another page in this direction
+        cursor.execute(f'''
+            SELECT 
+                id,
+                nom, 
+                prenom, 
+                telephone, 
+                LOWER(dncl_status) as dncl_status, 
+                dncl_registration_date, 
+                dncl_checked_at
+            FROM numbers 
+            WHERE dncl_checked_at IS NOT NULL
+            {key_filter}
+            ORDER BY dncl_checked_at {order}, id {order}
+            LIMIT ?
+        ''', (*params, per_page + 1))
     
-    rows = cursor.fetchall()
-    conn.close()
+        rows = cursor.fetchall()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before is not None:
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = after is not None, has_more
+
+    if before is not None and not has_newer:
+        page = 1  # Walked back to the newest results
     
     return render_template_string(
         HTML_TEMPLATE,
         rows=rows,
         page=page,
         total_pages=total_pages,
+        prev_cursor=encode_cursor(rows[0]) if rows and has_newer else None,
+        next_cursor=encode_cursor(rows[-1]) if rows and has_older else None,
         progress_percentage=progress_percentage,
         processed_count=processed_count,
         total_count=total_count
@@ -0,0 +1,170 @@
+"""
+Blocked Bloom filter over the registry keys, saved beside the index. Each number sets a
+few bits in a single 64-bit word, so a lookup costs one memory access: a number whose bits
+aren't all set is certainly not registered and skips the binary search over the index.
+"""
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the filter is built and queried key by key without it
+    np = None
+
+FILTER_MAGIC = b'DNCLBLM1'
+FILTER_VERSION = 1
+FILTER_HEADER = struct.Struct('<8sIIQQ')  # magic, version, reserved, word count, index fingerprint
+
+# 16 bits per registered number, 6 of them set per number: well under 1% false positives
+DEFAULT_BITS_PER_KEY = 16
+HASH_BITS = 6
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+def filter_path(index_path: Union[str, Path]) -> Path:
+    """Where the filter for an index file lives"""
+    index_path = Path(index_path)
+    return index_path.with_name(index_path.name + '.filter')
+
+def index_fingerprint(count: int, sample_keys: Iterable[int]) -> int:
+    """
+    Cheap identity of an index from its size and a few of its keys (first, middle, last),
+    so a filter is never used with another index's keys
+    """
+    if not count:
+        return 0
+    value = count
+    for key in sample_keys:
+        value = _mix(value ^ key)
+    return value
+
+def _mix(x: int) -> int:
+    """splitmix64 finalizer: spreads the bits of a number key over the whole word"""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+def _mix_array(x):
+    """_mix over a uint64 NumPy array (multiplication wraps modulo 2**64)"""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def _word_and_mask(hashed: int, word_count: int):
+    """Word index from the high half of the hash, HASH_BITS bit positions from the low bits"""
+    word = ((hashed >> 32) * word_count) >> 32
+    mask = 0
+    for i in range(HASH_BITS):
+        mask |= 1 << ((hashed >> (6 * i)) & 63)
+    return word, mask
+
+def _words_and_masks(hashed, word_count: int):
+    """_word_and_mask over a uint64 NumPy array"""
+    words = ((hashed >> np.uint64(32)) * np.uint64(word_count)) >> np.uint64(32)
+    masks = np.zeros(len(hashed), dtype=np.uint64)
+    for i in range(HASH_BITS):
+        masks |= np.uint64(1) << ((hashed >> np.uint64(6 * i)) & np.uint64(63))
+    return words.astype(np.int64), masks
+
+class RegistryFilter:
+    """Blocked Bloom filter: no false negatives, a small measured rate of false positives"""
+
+    def __init__(self, words, mapping: Optional[mmap.mmap] = None):
+        # words is an array when built in memory, a memoryview over `mapping` when opened from disk
+        self.words = words
+        self._mapping = mapping
+
+    @classmethod
+    def build(cls, keys, bits_per_key: int = DEFAULT_BITS_PER_KEY) -> 'RegistryFilter':
+        """Filter over every key of a (sorted or unsorted) uint64 key array"""
+        word_count = max(1, (len(keys) * bits_per_key + 63) // 64)
+        if np is not None:
+            bits = np.zeros(word_count, dtype=np.uint64)
+            if len(keys):
+                words, masks = _words_and_masks(_mix_array(np.frombuffer(keys, dtype=np.uint64)), word_count)
+                np.bitwise_or.at(bits, words, masks)
+            return cls(array('Q', bits.tobytes()))
+
+        bits = array('Q', bytes(word_count * 8))
+        for key in keys:
+            word, mask = _word_and_mask(_mix(key), word_count)
+            bits[word] |= mask
+        return cls(bits)
+
+    @classmethod
+    def open(cls, path: Union[str, Path], fingerprint: int) -> Optional['RegistryFilter']:
+        """Memory-map a saved filter; None if it is missing or belongs to a different index"""
+        if sys.byteorder != 'little' or not Path(path).exists():
+            return None
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, word_count, stored_fingerprint = FILTER_HEADER.unpack_from(mapping, 0)
+        if (magic != FILTER_MAGIC or version != FILTER_VERSION or stored_fingerprint != fingerprint
+                or len(mapping) < FILTER_HEADER.size + word_count * 8):
+            mapping.close()
+            return None
+        view = memoryview(mapping)
+        words = view[FILTER_HEADER.size:FILTER_HEADER.size + word_count * 8].cast('Q')
+        view.release()
+        return cls(words, mapping)
+
+    def save(self, path: Union[str, Path], fingerprint: int):
+        """Write the filter, atomically replacing any previous one"""
+        path = Path(path)
+        # A temp file of its own per writer, so concurrent saves never write into each other's file
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(FILTER_HEADER.pack(FILTER_MAGIC, FILTER_VERSION, 0, len(self.words), fingerprint))
+                f.write(self.words)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def close(self):
+        """Release the memory map of a filter opened with open()"""
+        if self._mapping is None:
+            return
+        self.words.release()
+        self._mapping.close()
+        self._mapping = None
+        self.words = array('Q', bytes(8))
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.words) * 8
+
+    def might_contain(self, key: int) -> bool:
+        """False means the key is certainly absent"""
+        word, mask = _word_and_mask(_mix(key), len(self.words))
+        return self.words[word] & mask == mask
+
+    def might_contain_many(self, keys):
+        """might_contain over a uint64 NumPy array, returning a boolean array"""
+        words, masks = _words_and_masks(_mix_array(keys), len(self.words))
+        return (np.frombuffer(self.words, dtype=np.uint64)[words] & masks) == masks
+
+def measure_false_positive_rate(key_filter: RegistryFilter, contains: Callable[[int], bool],
+                                samples: int = 100000, seed: int = 0) -> float:
+    """Share of random 10-digit numbers not in the index (contains) that the filter still lets through"""
+    rng = random.Random(seed)
+    false_positives = 0
+    negatives = 0
+    for _ in range(samples):
+        key = rng.randrange(2000000000, 10000000000)
+        if contains(key):
+            continue
+        negatives += 1
+        if key_filter.might_contain(key):
+            false_positives += 1
+    return false_positives / negatives if negatives else 0.0
@@ -0,0 +1,184 @@
+"""
+Scrub a call-list CSV against the local DNCL registry index on every core: the file is
+cut into blocks of whole records, worker processes parse, normalize and look up each
+block against their own memory map of the index (one shared copy in the page cache),
+and the blocks are written back out in input order as they complete.
+"""
+import csv
+import gzip
+import io
+import multiprocessing
+import os
+import sys
+from collections import Counter, deque
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from dncl_registry import DNCLRegistry, load_registry
+from phone_numbers import normalize_phone_column
+
+# Bytes of input handed to a worker at a time (about 50k rows of a typical lead file)
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Columns filled in every row in annotate mode (appended unless the list already has them)
+ANNOTATION_COLUMNS = ['dncl_phone', 'dncl_status', 'dncl_registration_date']
+
+SCRUB_MODES = ('annotate', 'filter')
+
+def open_binary(path: Union[str, Path], mode: str = 'rb') -> BinaryIO:
+    """Open a (possibly gzipped) file in binary mode; '-' is stdin/stdout"""
+    if str(path) == '-':
+        return sys.stdin.buffer if 'r' in mode else sys.stdout.buffer
+    if str(path).lower().endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+def iter_record_blocks(f: BinaryIO, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    Cut a CSV byte stream into blocks that end on a record boundary: the last newline
+    with an even number of quotes before it, so quoted fields spanning lines stay whole.
+    """
+    carry = b''
+    quotes_in_carry = 0
+    while True:
+        data = f.read(block_size)
+        if not data:
+            break
+        buffer = carry + data
+        quotes = quotes_in_carry + data.count(b'"')
+        cut = buffer.rfind(b'\n')
+        while cut >= 0:
+            after = buffer.count(b'"', cut + 1)
+            if (quotes - after) % 2 == 0:
+                break
+            cut = buffer.rfind(b'\n', 0, cut)
+        if cut < 0:
+            carry, quotes_in_carry = buffer, quotes
+            continue
+        yield buffer[:cut + 1]
+        carry = buffer[cut + 1:]
+        quotes_in_carry = carry.count(b'"')
+    if carry:
+        yield carry if carry.endswith(b'\n') else carry + b'\n'
+
+# Per-worker state, set up once by _init_worker
+_worker: Dict = {}
+
+def _init_worker(index_path: str, delimiter: str, phone_index: int, annotation_indexes: List[int],
+                 mode: str, keep_invalid: bool):
+    _worker.update(
+        registry=DNCLRegistry.open(index_path),
+        delimiter=delimiter,
+        phone_index=phone_index,
+        annotation_indexes=annotation_indexes,
+        mode=mode,
+        keep_invalid=keep_invalid
+    )
+
+def scrub_block(block: bytes) -> Tuple[bytes, Counter]:
+    """Scrub one block of whole CSV records; returns the output bytes and outcome counts"""
+    delimiter = _worker['delimiter']
+    phone_index = _worker['phone_index']
+    annotation_indexes = _worker['annotation_indexes']
+    width = max(annotation_indexes) + 1
+    rows = list(csv.reader(io.StringIO(block.decode('utf-8', errors='replace'), newline=''), delimiter=delimiter))
+    numbers = normalize_phone_column(row[phone_index] if len(row) > phone_index else None for row in rows)
+    valid = [number for number in numbers if number is not None]
+    matches = iter(_worker['registry'].lookup_many(valid))
+
+    counts: Counter = Counter()
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=delimiter, lineterminator='\n')
+    for row, number in zip(rows, numbers):
+        if not row:
+            continue
+        if number is None:
+            status, added_at = 'INVALID', None
+        else:
+            is_registered, added_at = next(matches)
+            status = 'ACTIVE' if is_registered else 'INACTIVE'
+        counts[status] += 1
+
+        if _worker['mode'] == 'filter':
+            if status == 'ACTIVE' or (status == 'INVALID' and not _worker['keep_invalid']):
+                continue
+            writer.writerow(row)
+        else:
+            if len(row) < width:
+                row += [''] * (width - len(row))
+            for index, value in zip(annotation_indexes, (number or '', status, added_at or '')):
+                row[index] = value
+            writer.writerow(row)
+        counts['written'] += 1
+    return out.getvalue().encode('utf-8'), counts
+
+def scrub_file(input_path: Union[str, Path], output_path: Union[str, Path],
+               phone_column: str = 'telephone', mode: str = 'annotate', keep_invalid: bool = False,
+               registry_path: Optional[Union[str, Path]] = None, index_path: Optional[Union[str, Path]] = None,
+               processes: Optional[int] = None, block_size: int = DEFAULT_BLOCK_SIZE) -> Counter:
+    """
+    Scrub a call list against the registry index. annotate fills dncl_phone, dncl_status
+    (ACTIVE / INACTIVE / INVALID) and dncl_registration_date in every row (reusing columns of
+    those names the list already has, appending the others); filter keeps only
+    the rows that may be called (INACTIVE, plus INVALID with keep_invalid).
+    Returns counts per status plus 'written'.
+    """
+    if mode not in SCRUB_MODES:
+        raise ValueError(f"Unknown scrub mode {mode}, expected one of {', '.join(SCRUB_MODES)}")
+    if index_path is None:
+        index_path = os.getenv('DNCL_REGISTRY_INDEX', '../dncl_registry.idx')
+    # Build or refresh the index once here; the workers only map it
+    load_registry(registry_path, index_path).close()
+
+    processes = processes or os.cpu_count() or 1
+    totals: Counter = Counter()
+    source = open_binary(input_path, 'rb')
+    target = open_binary(output_path, 'wb')
+    try:
+        header_line = source.readline()
+        if not header_line:
+            return totals
+        header_text = header_line.decode('utf-8-sig', errors='replace')
+        delimiter = max(',;\t|', key=header_text.count)
+        header = next(csv.reader([header_text], delimiter=delimiter))
+        lowered = [name.strip().lower() for name in header]
+        if phone_column.lower() not in lowered:
+            raise ValueError(f"No {phone_column} column in {input_path} (columns: {', '.join(header)})")
+
+        output_header = list(header)
+        annotation_indexes = []
+        for name in ANNOTATION_COLUMNS:
+            if name in lowered:
+                annotation_indexes.append(lowered.index(name))
+            else:
+                annotation_indexes.append(len(output_header))
+                output_header.append(name)
+        out = io.StringIO()
+        csv.writer(out, delimiter=delimiter, lineterminator='\n').writerow(
+            output_header if mode == 'annotate' else header)
+        target.write(out.getvalue().encode('utf-8'))
+
+        initargs = (str(index_path), delimiter, lowered.index(phone_column.lower()), annotation_indexes,
+                    mode, keep_invalid)
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+            # A bounded window of blocks in flight: output stays in input order and memory
+            # stays flat however large the list is
+            pending = deque()
+            for block in iter_record_blocks(source, block_size):
+                pending.append(pool.apply_async(scrub_block, (block,)))
+                if len(pending) >= processes * 2:
+                    data, counts = pending.popleft().get()
+                    target.write(data)
+                    totals.update(counts)
+            while pending:
+                data, counts = pending.popleft().get()
+                target.write(data)
+                totals.update(counts)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if target is not sys.stdout.buffer:
+            target.close()
+        else:
+            target.flush()
+    return totals
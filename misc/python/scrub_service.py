@@ -0,0 +1,257 @@
+"""
+Long-running DNCL lookup service: "is this number on the DNCL, and since when", answered
+from the memory-mapped registry index and the results already written to the numbers
+table, over HTTP (single and batch endpoints) or from the command line.
+
+    python scrub_service.py serve --port 5060
+    python scrub_service.py check 514-555-1234 "(438) 555-0000"
+    python scrub_service.py scrub ../data/engineers_dncl.csv scrubbed.csv --mode filter
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from flask import Flask, jsonify, request
+
+from database_manager import DatabaseManager, numbers_table_exists
+from dncl_registry import DNCLRegistry, load_registry
+from phone_numbers import normalize_phone_number
+from send_dncl_request import precheck_phone_number
+
+# Most numbers a single batch request may carry
+MAX_BATCH_SIZE = 50000
+
+# Numbers per SQL query when reading results for a batch (below SQLite's variable limit)
+RESULT_QUERY_CHUNK = 900
+
+# How often (seconds) the service looks for a rebuilt or delta-merged index file
+RELOAD_CHECK_SECONDS = 5.0
+
+class ScrubService:
+    """
+    Answers DNCL lookups from two sources: the registry index (the subscription snapshot)
+    and the numbers table (answers from individual checks). Whichever is more recent wins,
+    so a number checked through the API after the snapshot was taken gets the newer answer.
+    """
+
+    def __init__(self, registry_path: Optional[Union[str, Path]] = None,
+                 index_path: Optional[Union[str, Path]] = None,
+                 db_path: Optional[str] = "../numbers.db"):
+        self.registry_path = registry_path
+        self.index_path = Path(index_path or os.getenv('DNCL_REGISTRY_INDEX', '../dncl_registry.idx'))
+        # Checked first: DatabaseManager would create an empty database on a host that only
+        # has the index, and every lookup would then fail on the missing numbers table
+        self.db = None
+        if db_path and numbers_table_exists(db_path):
+            self.db = DatabaseManager(db_path)
+        elif db_path:
+            print(f"No numbers table in {db_path}, answering from the registry only")
+        self.registry: Optional[DNCLRegistry] = None
+        self.registry_as_of: Optional[str] = None
+        self._index_mtime: Optional[float] = None
+        self._next_reload_check = 0.0
+        self._reload_lock = threading.Lock()
+        self._load_registry()
+
+    def _load_registry(self):
+        """Open the index (building it from the registry files when needed); no index is not an error"""
+        try:
+            registry = load_registry(self.registry_path, self.index_path)
+        except FileNotFoundError:
+            print(f"No DNCL registry at {self.registry_path or self.index_path}, answering from the numbers table only")
+            return
+        self._index_mtime = self.index_path.stat().st_mtime
+        # Snapshot time recorded in the index (the index mtime only tells when it was built), in
+        # the same local ISO format as dncl_checked_at for the recency comparison
+        self.registry_as_of = datetime.fromtimestamp(registry.snapshot_at or self._index_mtime).isoformat()
+        # Requests still holding the previous registry keep their mapping until they finish
+        self.registry = registry
+
+    def reload_if_changed(self):
+        """Pick up an index replaced by `dncl_registry.py build` or `ingest`, checked every few seconds"""
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return
+        with self._reload_lock:
+            if now < self._next_reload_check:
+                return
+            self._next_reload_check = now + RELOAD_CHECK_SECONDS
+            try:
+                mtime = self.index_path.stat().st_mtime
+            except FileNotFoundError:
+                return
+            if mtime != self._index_mtime:
+                self._load_registry()
+
+    def _checked_results(self, numbers: List[str]) -> Dict[str, Tuple[str, Optional[str], str]]:
+        """Latest checked result per normalized number: {number: (status, registration_date, checked_at)}"""
+        if self.db is None or not numbers:
+            return {}
+        found = {}
+        with self.db.connection() as conn:
+            for start in range(0, len(numbers), RESULT_QUERY_CHUNK):
+                chunk = numbers[start:start + RESULT_QUERY_CHUNK]
+                # Bare columns with MAX() come from the row holding the latest check
+                rows = conn.execute(f"""
+                    SELECT dncl_phone, dncl_status, dncl_registration_date, MAX(dncl_checked_at) AS checked_at
+                    FROM numbers
+                    WHERE dncl_phone IN ({', '.join('?' for _ in chunk)})
+                    AND dncl_status IN ('ACTIVE', 'INACTIVE')
+                    GROUP BY dncl_phone
+                """, chunk).fetchall()
+                for row in rows:
+                    found[row['dncl_phone']] = (row['dncl_status'], row['dncl_registration_date'], row['checked_at'])
+        return found
+
+    def check_many(self, phone_numbers: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Look up many numbers at once, in input order. Each answer has the send_dncl_request
+        shape (Phone/Active/AddedAt, or status INVALID/UNKNOWN) plus the source it came from.
+        """
+        self.reload_if_changed()
+        registry = self.registry
+
+        phone_numbers = list(phone_numbers)
+        normalized = [normalize_phone_number(phone) for phone in phone_numbers]
+        valid = [number for number in normalized if number is not None]
+        checked = self._checked_results(list(dict.fromkeys(valid)))
+        matches = iter(registry.lookup_many(valid)) if registry is not None else None
+
+        results = []
+        for phone, number in zip(phone_numbers, normalized):
+            if number is None:
+                results.append({**precheck_phone_number(phone), 'source': 'validation'})
+                continue
+            is_registered, added_at = next(matches) if matches is not None else (False, None)
+
+            precheck_result = precheck_phone_number(number)
+            if precheck_result is not None:
+                results.append({**precheck_result, 'source': 'validation'})
+            elif number in checked and (registry is None or (checked[number][2] or '') > self.registry_as_of):
+                status, registration_date, checked_at = checked[number]
+                results.append({
+                    'Phone': number,
+                    'Active': status == 'ACTIVE',
+                    'AddedAt': registration_date,
+                    'source': 'checked',
+                    'checked_at': checked_at
+                })
+            elif registry is not None:
+                results.append({
+                    'Phone': number,
+                    'Active': is_registered,
+                    'AddedAt': added_at,
+                    'source': 'registry',
+                    'checked_at': self.registry_as_of
+                })
+            else:
+                results.append({'Phone': number, 'status': 'UNKNOWN', 'source': None})
+        return results
+
+    def check(self, phone_number: str) -> Dict[str, Any]:
+        """Look up one number"""
+        return self.check_many([phone_number])[0]
+
+    def status(self) -> Dict[str, Any]:
+        """What the service is answering from"""
+        return {
+            'registry_numbers': len(self.registry) if self.registry is not None else 0,
+            'registry_index': str(self.index_path),
+            'registry_as_of': self.registry_as_of,
+            'numbers_db': self.db.db_path if self.db is not None else None,
+        }
+
+app = Flask(__name__)
+_service: Optional[ScrubService] = None
+
+def get_service() -> ScrubService:
+    """Shared ScrubService, created on the first request unless run_server set one up"""
+    global _service
+    if _service is None:
+        _service = ScrubService()
+    return _service
+
+@app.route('/check')
+@app.route('/check/<phone>')
+def check(phone: Optional[str] = None):
+    phone = phone or request.args.get('phone')
+    if not phone:
+        return jsonify({'error': "Pass a number as /check/<phone> or ?phone="}), 400
+    return jsonify(get_service().check(phone))
+
+@app.route('/check/batch', methods=['POST'])
+def check_batch():
+    # JSON {"numbers": [...]} or a plain-text body with one number per line
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        numbers = payload.get('numbers') or []
+    else:
+        numbers = [line.strip() for line in request.get_data(as_text=True).splitlines() if line.strip()]
+    if not isinstance(numbers, list) or not all(isinstance(number, str) for number in numbers):
+        return jsonify({'error': "Expected {\"numbers\": [\"514-555-1234\", ...]}"}), 400
+    if len(numbers) > MAX_BATCH_SIZE:
+        return jsonify({'error': f"At most {MAX_BATCH_SIZE} numbers per batch"}), 413
+    return jsonify({'results': get_service().check_many(numbers)})
+
+@app.route('/health')
+def health():
+    return jsonify(get_service().status())
+
+def run_server(service: ScrubService, host: str = '127.0.0.1', port: int = 5060):
+    global _service
+    _service = service
+    app.run(host=host, port=port, threaded=True)
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description="Local DNCL lookup service")
+    parser.add_argument('--registry', default=None, help="Registry files (default: DNCL_REGISTRY_PATH)")
+    parser.add_argument('--index', default=None, help="Registry index (default: DNCL_REGISTRY_INDEX)")
+    parser.add_argument('--db', default='../numbers.db', help="numbers database with checked results (use '' to skip)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="Answer lookups over HTTP")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=5060)
+
+    check_parser = subparsers.add_parser('check', help="Look up numbers and print one JSON answer per line")
+    check_parser.add_argument('numbers', nargs='*', help="Numbers to look up (default: read stdin, one per line)")
+
+    scrub_parser = subparsers.add_parser('scrub', help="Annotate or filter a CSV call list on every core")
+    scrub_parser.add_argument('input', help="Call list CSV (optionally .gz, '-' for stdin)")
+    scrub_parser.add_argument('output', help="Scrubbed CSV (optionally .gz, '-' for stdout)")
+    scrub_parser.add_argument('--phone-column', default='telephone')
+    scrub_parser.add_argument('--mode', choices=['annotate', 'filter'], default='annotate',
+                              help="annotate: add DNCL columns to every row; filter: keep only callable rows")
+    scrub_parser.add_argument('--keep-invalid', action='store_true', help="In filter mode, keep rows whose number is invalid")
+    scrub_parser.add_argument('--processes', type=int, default=None, help="Worker processes (default: all cores)")
+
+    args = parser.parse_args()
+
+    if args.command == 'scrub':
+        # Registry only: the call list never goes through the numbers table
+        from scrub_list import scrub_file
+
+        start_time = time.time()
+        counts = scrub_file(args.input, args.output, args.phone_column, args.mode, args.keep_invalid,
+                            args.registry, args.index, args.processes)
+        print(f"Scrubbed {counts['ACTIVE'] + counts['INACTIVE'] + counts['INVALID']} rows in {time.time() - start_time:.1f}s: "
+              f"{counts['ACTIVE']} registered, {counts['INACTIVE']} not registered, {counts['INVALID']} invalid, "
+              f"{counts['written']} written", file=sys.stderr)
+        sys.exit(0)
+
+    service = ScrubService(args.registry, args.index, args.db or None)
+
+    if args.command == 'serve':
+        print(f"Serving DNCL lookups on http://{args.host}:{args.port} ({service.status()['registry_numbers']} registry numbers)")
+        run_server(service, args.host, args.port)
+    else:
+        numbers = args.numbers or [line.strip() for line in sys.stdin if line.strip()]
+        for result in service.check_many(numbers):
+            print(json.dumps(result))
@@ -1,26 +1,84 @@
 import requests
 import json
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import os
 from dotenv import load_dotenv
 import asyncio
+from phone_numbers import normalize_phone_number, is_canadian_number
 
 load_dotenv()
 
+# Overridable so the pipeline can run against mock_dncl_server.py
+DNCL_API_URL = os.getenv('DNCL_API_URL') or 'https://public-api.lnnte-dncl.gc.ca/v1/Consumer/Check'
+
 class TokenExpiredError(Exception):
     """Custom exception to indicate when a token has expired/is invalid"""
     pass
 
 def format_phone_number(phone: str) -> str:
-    """Trim whitespace, take first 12 characters (###-###-####), and remove dashes"""
+    """
+    Bare 10 digits for anything normalize_phone_number understands; otherwise trim whitespace,
+    take first 12 characters (###-###-####), and remove dashes
+    """
+    normalized = normalize_phone_number(phone)
+    if normalized is not None:
+        return normalized
     return phone.strip()[:12].replace('-', '')
 
+def precheck_phone_number(phone_number: str) -> Optional[Dict[str, Any]]:
+    """
+    Answer locally what the API would reject anyway: an INVALID result (same shape as the
+    API's 400 "area code is invalid" case) for a malformed number or a non-Canadian area
+    code, None when the number needs a real check.
+    """
+    normalized = normalize_phone_number(phone_number)
+    if normalized is None:
+        return {
+            'Phone': format_phone_number(phone_number),
+            'status': 'INVALID',
+            'error': 'Invalid phone number'
+        }
+    if not is_canadian_number(normalized):
+        return {
+            'Phone': normalized,
+            'status': 'INVALID',
+            'error': 'Invalid area code'
+        }
+    return None
+
+def lookup_dncl_registry_batch(phone_numbers: List[str], registry) -> List[Dict[str, Any]]:
+    """
+    Check phone numbers against a locally loaded DNCL registry (see dncl_registry.DNCLRegistry)
+    with one registry.lookup_many call. Each result has the same shape as send_dncl_request.
+    """
+    formatted_phones = [format_phone_number(phone) for phone in phone_numbers]
+    matches = registry.lookup_many(formatted_phones)
+
+    results = []
+    for phone_number, formatted_phone, (is_registered, added_at) in zip(phone_numbers, formatted_phones, matches):
+        precheck_result = precheck_phone_number(phone_number)
+        if precheck_result is not None:
+            results.append(precheck_result)
+        else:
+            results.append({
+                'Phone': formatted_phone,
+                'Active': is_registered,
+                'AddedAt': added_at
+            })
+    return results
+
 async def send_dncl_request(phone_number: str, token: str, max_retries: int = 3) -> Dict[str, Any]:
     """
     Send request to DNCL API to check phone number registration status
     """
     formatted_phone = format_phone_number(phone_number)
+
+    # Don't spend the token or a round trip on a number the API is bound to reject
+    precheck_result = precheck_phone_number(phone_number)
+    if precheck_result is not None:
+        print(f"Skipping {phone_number}: {precheck_result['error']}")
+        return precheck_result
     
     data = {
         "Phone": formatted_phone
@@ -65,7 +123,7 @@ async def send_dncl_request(phone_number: str, token: str, max_retries: int = 3)
 
         try:
             response = requests.post(
-                'https://public-api.lnnte-dncl.gc.ca/v1/Consumer/Check',
+                DNCL_API_URL,
                 json=data,
                 headers=headers,
               #  proxies=proxy_config,